@@ -0,0 +1,241 @@
+"""Adaptive ticket admission: per-user limits, cooldowns and inactivity timeouts.
+
+Run as a script to replay an analytics event log against the policy:
+
+    python admission.py events.jsonl --staff 3
+"""
+import argparse
+import heapq
+import itertools
+import json
+import math
+import statistics
+import time
+from collections import Counter, deque
+
+TICKETS_PER_STAFF = 3       # tickets one online tester can reasonably work at once
+DRAIN_HOURS = 1             # queue we accept clearing within this many hours of recent close rate
+RATE_WINDOW = 3600
+
+# (name, max pressure, limits); limits missing a key fall back to the defaults.
+# The bot's default is one open ticket per user; only a quiet queue allows a second.
+LEVELS = [
+    ("relaxed", 0.5, {"max_tickets": 2, "cooldown": 30, "inactivity": 1800}),
+    ("normal", 1.0, {}),
+    ("busy", 2.0, {"max_tickets": 1, "cooldown": 300, "inactivity": 900}),
+    ("saturated", math.inf, {"max_tickets": 1, "cooldown": 900, "inactivity": 600}),
+]
+LIMIT_KEYS = ("max_tickets", "cooldown", "inactivity")
+
+
+def check_admission(limits: dict, open_tickets: int, last_open: float | None, now: float) -> str | None:
+    """Why a user may not open a ticket right now (``"limit"``/``"cooldown"``), or None."""
+    if open_tickets >= limits["max_tickets"]:
+        return "limit"
+    if last_open is not None and now - last_open < limits["cooldown"]:
+        return "cooldown"
+    return None
+
+
+class AdmissionController:
+    """Tightens or relaxes ticket limits from queue length, online staff and close rate."""
+
+    def __init__(self, defaults: dict, clock=time.time):
+        self.defaults = dict(defaults)
+        self.clock = clock
+        self.overrides = {}
+        self.level = 1
+        self.pressure = 0.0
+        self.inputs = {"open": 0, "staff_online": 0, "closes_per_hour": 0}
+        self._closes = deque()
+
+    # -------------------- INPUTS --------------------
+
+    def record_close(self, ts: float | None = None):
+        self._closes.append(self.clock() if ts is None else ts)
+
+    def closes_per_hour(self, now: float) -> float:
+        while self._closes and self._closes[0] < now - RATE_WINDOW:
+            self._closes.popleft()
+        return len(self._closes) * 3600 / RATE_WINDOW
+
+    # -------------------- POLICY --------------------
+
+    def update(self, open_tickets: int, staff_online: int, now: float | None = None) -> str:
+        """Recompute the load level; moves at most one level per call to avoid flapping."""
+        now = self.clock() if now is None else now
+        rate = self.closes_per_hour(now)
+        capacity = max(staff_online * TICKETS_PER_STAFF, rate * DRAIN_HOURS) if staff_online else 0
+
+        if open_tickets == 0:
+            self.pressure = 0.0
+        elif capacity == 0:
+            self.pressure = math.inf
+        else:
+            self.pressure = open_tickets / capacity
+
+        target = next(i for i, (_, bound, _) in enumerate(LEVELS) if self.pressure <= bound)
+        if target > self.level:
+            self.level += 1
+        elif target < self.level:
+            self.level -= 1
+
+        self.inputs = {"open": open_tickets, "staff_online": staff_online, "closes_per_hour": rate}
+        return self.level_name
+
+    @property
+    def level_name(self) -> str:
+        return LEVELS[self.level][0]
+
+    @property
+    def limits(self) -> dict:
+        limits = {**self.defaults, **LEVELS[self.level][2]}
+        limits.update(self.overrides)
+        return limits
+
+    def inactivity_for(self, claimed: bool) -> int:
+        """Idle seconds before a ticket auto-closes.
+
+        Load only shortens this for claimed tickets while testers are online; a
+        ticket waiting on absent or busy staff keeps at least the default.
+        """
+        limits = self.limits
+        if "inactivity" in self.overrides or (claimed and self.inputs["staff_online"]):
+            return limits["inactivity"]
+        return max(limits["inactivity"], self.defaults["inactivity"])
+
+    def upper_bound(self, key: str) -> int:
+        """Largest value ``key`` can take under any level or the current overrides."""
+        if key in self.overrides:
+            return self.overrides[key]
+        return max(level.get(key, self.defaults[key]) for _, _, level in LEVELS)
+
+    def set_override(self, key: str, value: int | None):
+        if key not in LIMIT_KEYS:
+            raise ValueError(f"Unknown limit `{key}`")
+        if value is None:
+            self.overrides.pop(key, None)
+        else:
+            self.overrides[key] = value
+
+# -------------------- SIMULATION --------------------
+
+def simulate(events: list[dict], defaults: dict, staff_online: int | None = None,
+             adaptive: bool = True, interval: int = 300) -> dict:
+    """Replay recorded ticket opens/closes and report what the policy would have admitted.
+
+    ``capacity`` events in the log supply online staff over time; ``staff_online``
+    overrides them with a constant. Tickets the policy rejects are dropped together
+    with their recorded close. Opens the bot refused (``ticket_rejected``) are
+    offered again; if admitted now, they are assumed to stay open for the median
+    recorded ticket lifetime. A refused user may have retried, so this demand is
+    an upper bound.
+    """
+    events = sorted(events, key=lambda e: e["ts"])
+    opened_at = {}
+    lifetimes = []
+    for event in events:
+        if event["kind"] == "ticket_open":
+            opened_at[event["channel"]] = event["ts"]
+        elif event["kind"] == "ticket_close" and event["channel"] in opened_at:
+            lifetimes.append(event["ts"] - opened_at.pop(event["channel"]))
+    lifetime = statistics.median(lifetimes) if lifetimes else 3600
+
+    controller = AdmissionController(defaults, clock=lambda: 0)
+    staff = staff_online if staff_online is not None else 0
+    open_by_user = {}
+    owner = {}
+    last_open = {}
+    synthetic_closes = []   # heap of (ts, channel) for replayed opens the log never closed
+    synthetic_ids = itertools.count(-1, -1)
+    admitted = rejected_limit = rejected_cooldown = recovered = 0
+    peak_open = 0
+    level_time = Counter()
+    next_update = None
+    last_ts = None
+
+    def close(channel, ts):
+        user = owner.pop(channel, None)
+        if user is not None:
+            open_by_user[user].discard(channel)
+            controller.record_close(ts)
+
+    for event in events:
+        ts = event["ts"]
+        if next_update is None:
+            next_update = ts
+
+        while synthetic_closes and synthetic_closes[0][0] <= ts:
+            close_ts, channel = heapq.heappop(synthetic_closes)
+            close(channel, close_ts)
+
+        while adaptive and next_update <= ts:
+            controller.update(len(owner), staff, now=next_update)
+            next_update += interval
+        if last_ts is not None:
+            level_time[controller.level_name] += ts - last_ts
+        last_ts = ts
+
+        kind = event["kind"]
+        if kind == "capacity" and staff_online is None:
+            staff = event.get("staff_online", staff)
+
+        elif kind in ("ticket_open", "ticket_rejected"):
+            user = event["user"]
+            reason = check_admission(controller.limits, len(open_by_user.get(user, ())), last_open.get(user), ts)
+            if reason == "limit":
+                rejected_limit += 1
+                continue
+            if reason == "cooldown":
+                rejected_cooldown += 1
+                continue
+            admitted += 1
+            if kind == "ticket_open":
+                channel = event["channel"]
+            else:
+                recovered += 1
+                channel = next(synthetic_ids)
+                heapq.heappush(synthetic_closes, (ts + lifetime, channel))
+            last_open[user] = ts
+            owner[channel] = user
+            open_by_user.setdefault(user, set()).add(channel)
+            peak_open = max(peak_open, len(owner))
+
+        elif kind == "ticket_close":
+            close(event["channel"], ts)
+
+    total = admitted + rejected_limit + rejected_cooldown
+    return {
+        "policy": "adaptive" if adaptive else "static",
+        "opens": total,
+        "admitted": admitted,
+        "admitted_previously_refused": recovered,
+        "rejected_limit": rejected_limit,
+        "rejected_cooldown": rejected_cooldown,
+        "admit_rate": round(admitted / total, 3) if total else None,
+        "peak_open": peak_open,
+        "hours_per_level": {k: round(v / 3600, 2) for k, v in level_time.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay an analytics event log against the admission policy")
+    parser.add_argument("events", help="events.jsonl written by the bot")
+    parser.add_argument("--staff", type=int, default=None, help="assume this many testers online throughout")
+    parser.add_argument("--max-tickets", type=int, default=1)
+    parser.add_argument("--cooldown", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    with open(args.events) as f:
+        events = [json.loads(line) for line in f if line.strip()]
+
+    if args.staff is None and not any(e["kind"] == "capacity" for e in events):
+        parser.error("the log has no capacity events yet; pass --staff")
+
+    defaults = {"max_tickets": args.max_tickets, "cooldown": args.cooldown}
+    for adaptive in (False, True):
+        print(json.dumps(simulate(events, defaults, args.staff, adaptive=adaptive)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+import csv
+import io
+import json
+import os
+import time
+from collections import Counter, defaultdict
+
+EVENTS_FILE = "events.jsonl"
+SNAPSHOT_FILE = "analytics.json"
+BUCKET_SECONDS = 3600
+RETENTION_BUCKETS = 24 * 7
+RECENT_BUCKET_SECONDS = 60        # minute buckets back the rolling "last N seconds" counts
+RECENT_RETENTION = 24 * 60
+
+# -------------------- SKETCHES --------------------
+
+class P2Quantile:
+    """Streaming quantile estimate (P² algorithm), constant memory."""
+
+    def __init__(self, q: float):
+        self.q = q
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+        self.increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, x: float):
+        self.count += 1
+        if self.count <= 5:
+            self.heights.append(x)
+            self.heights.sort()
+            return
+
+        h = self.heights
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= x < h[i + 1])
+
+        for i in range(k + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in range(1, 4):
+            d = self.desired[i] - self.positions[i]
+            if (d >= 1 and self.positions[i + 1] - self.positions[i] > 1) or \
+               (d <= -1 and self.positions[i - 1] - self.positions[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not h[i - 1] < candidate < h[i + 1]:
+                    candidate = self._linear(i, step)
+                h[i] = candidate
+                self.positions[i] += step
+
+    def _parabolic(self, i, d):
+        h, n = self.heights, self.positions
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i, d):
+        h, n = self.heights, self.positions
+        return h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+
+    def value(self) -> float | None:
+        if not self.count:
+            return None
+        if self.count <= 5:
+            ordered = sorted(self.heights)
+            return ordered[min(len(ordered) - 1, int(self.q * len(ordered)))]
+        return self.heights[2]
+
+    def state(self) -> dict:
+        return {"count": self.count, "heights": self.heights, "positions": self.positions, "desired": self.desired}
+
+    def restore(self, state: dict):
+        self.count = state["count"]
+        self.heights = state["heights"]
+        self.positions = state["positions"]
+        self.desired = state["desired"]
+
+
+class BucketCounter:
+    """Per-key counters grouped into fixed time buckets."""
+
+    def __init__(self, bucket_seconds: int = BUCKET_SECONDS, retention: int = RETENTION_BUCKETS):
+        self.bucket_seconds = bucket_seconds
+        self.retention = retention
+        self.buckets = {}
+
+    def _bucket(self, ts: float) -> int:
+        return int(ts // self.bucket_seconds) * self.bucket_seconds
+
+    def add(self, ts: float, key: str, amount: int = 1):
+        bucket = self._bucket(ts)
+        self.buckets.setdefault(bucket, Counter())[key] += amount
+
+        oldest = bucket - self.retention * self.bucket_seconds
+        if len(self.buckets) > self.retention:
+            for b in [b for b in self.buckets if b <= oldest]:
+                del self.buckets[b]
+
+    def total(self, key: str, now: float, seconds: int) -> int:
+        """Events in the rolling window ``(now - seconds, now]``, to bucket resolution.
+
+        The bucket straddling the window start is left out, so counts can lag by
+        up to one bucket.
+        """
+        start = now - seconds
+        return sum(c[key] for b, c in self.buckets.items() if start < b <= now)
+
+    def series(self, now: float, hours: int):
+        start = self._bucket(now) - (hours - 1) * self.bucket_seconds
+        for i in range(hours):
+            b = start + i * self.bucket_seconds
+            yield b, self.buckets.get(b, Counter())
+
+    def state(self) -> dict:
+        return {str(b): counts for b, counts in self.buckets.items()}
+
+    def restore(self, state: dict):
+        self.buckets = {int(b): Counter(counts) for b, counts in state.items()}
+
+# -------------------- ENGINE --------------------
+
+class Analytics:
+    """Append-only event log with incrementally maintained aggregates.
+
+    ``snapshot()`` stores the aggregates together with the log size they cover,
+    so ``load()`` only replays events appended since.
+    """
+
+    def __init__(self, path: str = EVENTS_FILE, clock=time.time, snapshot_path: str = SNAPSHOT_FILE):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.clock = clock
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.hourly = BucketCounter()
+        self.recent = BucketCounter(RECENT_BUCKET_SECONDS, RECENT_RETENTION)
+        self.totals = Counter()
+        self.claim_time = {0.5: P2Quantile(0.5), 0.9: P2Quantile(0.9)}
+        self.close_time = {0.5: P2Quantile(0.5), 0.9: P2Quantile(0.9)}
+        self.tester_tests = Counter()
+        self.results = defaultdict(Counter)   # (mode, region) -> WON/LOST
+        self.tiers = defaultdict(Counter)     # (mode, region) -> earned tier
+
+        self._opened = {}
+        self._claimed = set()
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+
+        offset = self._restore_snapshot()
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                line = line.strip()
+                if line:
+                    self._apply(json.loads(line))
+
+    def snapshot(self):
+        # only once loaded, otherwise the offset would claim events we never applied
+        if not self.loaded:
+            return
+        state = {
+            "offset": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "head": self._log_head(),
+            "hourly": self.hourly.state(),
+            "recent": self.recent.state(),
+            "totals": self.totals,
+            "claim_time": {str(q): s.state() for q, s in self.claim_time.items()},
+            "close_time": {str(q): s.state() for q, s in self.close_time.items()},
+            "tester_tests": self.tester_tests,
+            "results": [[mode, region, counts] for (mode, region), counts in self.results.items()],
+            "tiers": [[mode, region, counts] for (mode, region), counts in self.tiers.items()],
+            "opened": {str(cid): ts for cid, ts in self._opened.items()},
+            "claimed": list(self._claimed),
+        }
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.snapshot_path)
+
+    def _restore_snapshot(self) -> int:
+        """Load the snapshot if it still matches the log; returns the offset to replay from."""
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        try:
+            with open(self.snapshot_path) as f:
+                state = json.load(f)
+            # a log that is shorter or starts differently was rotated or truncated; rebuild from scratch
+            if state["offset"] > os.path.getsize(self.path) or state["head"] != self._log_head():
+                return 0
+            self.hourly.restore(state["hourly"])
+            self.recent.restore(state["recent"])
+            self.totals = Counter(state["totals"])
+            for q, s in state["claim_time"].items():
+                self.claim_time[float(q)].restore(s)
+            for q, s in state["close_time"].items():
+                self.close_time[float(q)].restore(s)
+            self.tester_tests = Counter({int(k): v for k, v in state["tester_tests"].items()})
+            for mode, region, counts in state["results"]:
+                self.results[(mode, region)] = Counter(counts)
+            for mode, region, counts in state["tiers"]:
+                self.tiers[(mode, region)] = Counter(counts)
+            self._opened = {int(cid): ts for cid, ts in state["opened"].items()}
+            self._claimed = set(state["claimed"])
+        except (ValueError, KeyError, TypeError):
+            self._reset()
+            return 0
+        return state["offset"]
+
+    def _log_head(self) -> str:
+        if not os.path.exists(self.path):
+            return ""
+        with open(self.path, "rb") as f:
+            return f.readline().decode()
+
+    def open_tickets(self) -> set[int]:
+        return set(self._opened)
+
+    def record(self, kind: str, **fields):
+        event = {"ts": self.clock(), "kind": kind, **fields}
+        with open(self.path, "a") as f:
+            f.write(json.dumps(event) + "\n")
+        self._apply(event)
+
+    def _apply(self, event: dict):
+        kind, ts = event["kind"], event["ts"]
+        self.totals[kind] += 1
+        self.hourly.add(ts, kind)
+        self.recent.add(ts, kind)
+
+        if kind == "ticket_open":
+            self._opened[event["channel"]] = ts
+
+        elif kind == "ticket_claim":
+            cid = event["channel"]
+            opened = self._opened.get(cid)
+            if opened is not None and cid not in self._claimed:
+                self._claimed.add(cid)
+                for sketch in self.claim_time.values():
+                    sketch.add(ts - opened)
+
+        elif kind == "ticket_close":
+            cid = event["channel"]
+            opened = self._opened.pop(cid, None)
+            self._claimed.discard(cid)
+            if opened is not None:
+                for sketch in self.close_time.values():
+                    sketch.add(ts - opened)
+
+        elif kind == "tier_result":
+            key = (event["mode"], event["region"])
+            self.tester_tests[event["tester"]] += 1
+            self.results[key][event["result"]] += 1
+            self.tiers[key][event["earned_tier"]] += 1
+
+    # -------------------- VIEWS --------------------
+
+    def last(self, kind: str, seconds: int, now: float | None = None) -> int:
+        return self.recent.total(kind, now or self.clock(), seconds)
+
+    def overview(self, now: float | None = None) -> dict:
+        now = now or self.clock()
+        return {
+            "opened_24h": self.last("ticket_open", 86400, now),
+            "closed_24h": self.last("ticket_close", 86400, now),
+            "opened_1h": self.last("ticket_open", 3600, now),
+            "closed_1h": self.last("ticket_close", 3600, now),
+            "median_claim": self.claim_time[0.5].value(),
+            "p90_claim": self.claim_time[0.9].value(),
+            "median_close": self.close_time[0.5].value(),
+            "p90_close": self.close_time[0.9].value(),
+            "applications": self.totals["application_submit"],
+            "accepted": self.totals["application_accept"],
+            "rejected": self.totals["application_reject"],
+        }
+
+    def export_csv(self, view: str, now: float | None = None) -> str:
+        now = now or self.clock()
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+
+        if view == "tickets":
+            kinds = ["ticket_open", "ticket_claim", "ticket_close"]
+            writer.writerow(["hour_utc", *kinds])
+            for bucket, counts in self.hourly.series(now, 24 * 7):
+                hour = time.strftime("%Y-%m-%d %H:00", time.gmtime(bucket))
+                writer.writerow([hour, *(counts[k] for k in kinds)])
+
+        elif view == "testers":
+            writer.writerow(["tester_id", "tests"])
+            for tester, count in self.tester_tests.most_common():
+                writer.writerow([tester, count])
+
+        elif view == "tiers":
+            writer.writerow(["mode", "region", "won", "lost", "tier", "count"])
+            for (mode, region), tiers in sorted(self.tiers.items()):
+                results = self.results[(mode, region)]
+                for tier, count in tiers.most_common():
+                    writer.writerow([mode, region, results["WON"], results["LOST"], tier, count])
+
+        else:
+            writer.writerow(["metric", "value"])
+            for name, value in self.overview(now).items():
+                writer.writerow([name, "" if value is None else round(value, 1)])
+
+        return buf.getvalue()
+
+def format_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "—"
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60}m"
@@ -0,0 +1,134 @@
+import atexit
+import contextlib
+import contextvars
+import copy
+import datetime
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+
+correlation_id = contextvars.ContextVar("correlation_id", default=None)
+ticket_id = contextvars.ContextVar("ticket_id", default=None)
+
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sample", "taskName"}
+
+
+def set_context(correlation=None, ticket=None):
+    """Tag every log record emitted from the current task (and tasks it spawns)."""
+    if correlation is not None:
+        correlation_id.set(str(correlation))
+    if ticket is not None:
+        ticket_id.set(ticket)
+
+
+@contextlib.contextmanager
+def log_context(correlation=None, ticket=None):
+    tokens = []
+    if correlation is not None:
+        tokens.append((correlation_id, correlation_id.set(str(correlation))))
+    if ticket is not None:
+        tokens.append((ticket_id, ticket_id.set(ticket)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        record.correlation_id = correlation_id.get()
+        record.ticket_id = ticket_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in ``rate`` records tagged with ``extra={"sample": key}``."""
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = max(1, rate)
+        self.counters = {}
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None or self.rate == 1:
+            return True
+        counter = self.counters.setdefault(key, itertools.count())
+        return next(counter) % self.rate == 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+_exc_formatter = logging.Formatter()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Snapshot the record on the calling thread; layout and I/O happen on the listener.
+
+    Args, extras and exceptions can reference live objects (discord models, config
+    dicts) that may change before the listener thread gets to the record, so they
+    are rendered to strings here, as the stdlib handler does.
+    """
+
+    _PLAIN = (str, int, float, bool)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        for key, value in list(vars(record).items()):
+            if key not in _STANDARD_ATTRS and value is not None and not isinstance(value, self._PLAIN):
+                setattr(record, key, str(value))
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        tags = [f"{k}={getattr(record, k)}" for k in ("correlation_id", "ticket_id") if getattr(record, k, None)]
+        return f"{line} [{' '.join(tags)}]" if tags else line
+
+
+def setup_logging(level: str = "INFO", fmt: str = "text", sample_rate: int = 1) -> logging.handlers.QueueListener:
+    """Route all records through a queue so handler I/O runs on a listener thread."""
+    stream = logging.StreamHandler()
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
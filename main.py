@@ -8,33 +8,90 @@ from dotenv import load_dotenv
 import datetime
 import json
 import logging
+from analytics import Analytics, format_duration
+from mirror import AttachmentMirror
+from logging_config import setup_logging, set_context, log_context
+from warns import WarnManager, DEFAULT_LADDER, parse_ladder, format_ladder, format_schedule
+from supervisor import Supervisor
+from admission import AdmissionController, check_admission
 logger = logging.getLogger("crystalhub")
-logging.basicConfig(level=logging.INFO)
 
 load_dotenv()
 TOKEN = os.getenv("TOKEN")
 GUILD_ID = int(os.getenv("GUILD_ID"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_SAMPLE_RATE = int(os.getenv("LOG_SAMPLE_RATE", "20"))
+MIRROR_DIR = os.getenv("MIRROR_DIR")
+MIRROR_MAX_MB = int(os.getenv("MIRROR_MAX_MB", "1024"))
+MIRROR_CONCURRENCY = int(os.getenv("MIRROR_CONCURRENCY", "4"))
 
 intents = discord.Intents.all()
 intents.message_content = True
-client = discord.Client(intents=intents)
-tree = app_commands.CommandTree(client)
+class CrystalHubClient(discord.Client):
+    async def close(self):
+        await supervisor.stop()
+        analytics.snapshot()
+        if mirror:
+            await mirror.close()
+        await super().close()
+
+client = CrystalHubClient(intents=intents)
+
+setup_logging(LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE)
+
+def trace_interaction(interaction: discord.Interaction):
+    channel_id = interaction.channel_id
+    set_context(
+        correlation=f"ix-{interaction.id}",
+        ticket=channel_id if channel_id in ticket_owners else None
+    )
+
+class TracedTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        trace_interaction(interaction)
+        return True
+
+class TracedView(discord.ui.View):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        trace_interaction(interaction)
+        return True
+
+class TracedModal(discord.ui.Modal):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        trace_interaction(interaction)
+        return True
+
+tree = TracedTree(client)
 
 CONFIG_FILE = "config.json"
 
 ticket_config = {}
 application_config = {}
 ticket_owners = {}
-warn_waiting = {}
+user_tickets = {}
 tier_filled = {}
 APPLICATION_COOLDOWN = 86400
 application_times = {}
 active_applications = {}
 last_activity = {}
-MAX_TICKETS = 2
+MAX_TICKETS = 1
 TICKET_COOLDOWN = 60
+INACTIVITY_TIMEOUT = 1200
+CAPACITY_INTERVAL = 300
+SNAPSHOT_INTERVAL = 600
 user_ticket_cooldown = {}
 claimed_by = {}
+closing_tickets = set()
+analytics = Analytics()
+warns = WarnManager()
+supervisor = Supervisor()
+admission = AdmissionController({
+    "max_tickets": MAX_TICKETS,
+    "cooldown": TICKET_COOLDOWN,
+    "inactivity": INACTIVITY_TIMEOUT,
+})
+mirror = AttachmentMirror(MIRROR_DIR, MIRROR_MAX_MB * 1024 * 1024, MIRROR_CONCURRENCY) if MIRROR_DIR else None
 
 def save_config():
     with open(CONFIG_FILE, "w") as f:
@@ -59,30 +116,107 @@ async def generate_transcript(channel: discord.TextChannel) -> str:
         author = f"{msg.author} ({msg.author.id})"
         content = msg.content or ""
         if msg.attachments:
-            content += " " + " ".join(a.url for a in msg.attachments)
+            refs = [a.url for a in msg.attachments]
+            if mirror:
+                local = await asyncio.gather(*(mirror.fetch(a.url, a.filename) for a in msg.attachments))
+                refs = [os.path.join(MIRROR_DIR, path) if path else url for path, url in zip(local, refs)]
+            content += " " + " ".join(refs)
         lines.append(f"[{timestamp}] {author}: {content}")
     return "\n".join(lines)
 
+def register_ticket(channel_id: int, user_id: int):
+    ticket_owners[channel_id] = user_id
+    user_tickets.setdefault(user_id, set()).add(channel_id)
+    last_activity[channel_id] = discord.utils.utcnow().timestamp()
+
+def load_tickets(guild: discord.Guild):
+    # ticket_owners only lives in memory, so rebuild it from the ticket category on startup
+    category = guild.get_channel(ticket_config.get("category", 0))
+    if not isinstance(category, discord.CategoryChannel):
+        return
+
+    for channel in category.text_channels:
+        if channel.id in ticket_owners or not channel.name.startswith("tier-"):
+            continue
+        owner = next((target for target in channel.overwrites if not isinstance(target, discord.Role)), None)
+        if owner is None:
+            continue
+        register_ticket(channel.id, owner.id)
+        last_activity[channel.id] = discord.utils.snowflake_time(channel.last_message_id or channel.id).timestamp()
+
+    # tickets deleted while the bot was offline never got a close event
+    for channel_id in analytics.open_tickets() - ticket_owners.keys():
+        analytics.record("ticket_close", channel=channel_id, reason="deleted")
+
+    logger.info("Loaded %d open tickets from %s", len(ticket_owners), category.name)
+
+def forget_ticket(channel_id: int):
+    owner_id = ticket_owners.pop(channel_id, None)
+    if owner_id is not None:
+        channels = user_tickets.get(owner_id, set())
+        channels.discard(channel_id)
+        if not channels:
+            user_tickets.pop(owner_id, None)
+    last_activity.pop(channel_id, None)
+    claimed_by.pop(channel_id, None)
+    tier_filled.pop(channel_id, None)
+    warns.clear_channel(channel_id)
+
+def retire_ticket(channel_id: int, reason: str):
+    # the channel is gone: drop its state and count the close exactly once
+    forget_ticket(channel_id)
+    admission.record_close()
+    analytics.record("ticket_close", channel=channel_id, reason=reason)
+
+def begin_close(channel_id: int) -> bool:
+    # claimed synchronously so concurrent close paths never both delete the channel;
+    # the ticket stays registered until finish_close so a failed close can be retried
+    if channel_id in closing_tickets:
+        return False
+    closing_tickets.add(channel_id)
+    return True
+
+def abort_close(channel_id: int):
+    closing_tickets.discard(channel_id)
+    # deleted by hand while we were closing: on_guild_channel_delete left it to us
+    if channel_id in ticket_owners and not client.get_channel(channel_id):
+        retire_ticket(channel_id, "deleted")
+
+async def finish_close(channel: discord.TextChannel, reason: str):
+    try:
+        try:
+            await channel.delete()
+        except discord.NotFound:
+            logger.info("Ticket channel %s was already deleted", channel.id)
+        retire_ticket(channel.id, reason)
+    finally:
+        closing_tickets.discard(channel.id)
+
 def find_existing_ticket(guild: discord.Guild, user_id: int) -> discord.TextChannel | None:
-    for channel_id, owner_id in ticket_owners.items():
-        if owner_id == user_id:
-            channel = guild.get_channel(channel_id)
-            if channel:
-                return channel
+    for channel_id in user_tickets.get(user_id, ()):
+        channel = guild.get_channel(channel_id)
+        if channel:
+            return channel
     return None
 
 def count_user_tickets(user_id: int):
-    return sum(1 for owner in ticket_owners.values() if owner == user_id)
-
-async def auto_close_task():
-    while True:
-        await asyncio.sleep(60)
-        now = discord.utils.utcnow().timestamp()
-        to_close = [cid for cid, ts in last_activity.items() if now - ts > 1200]
-
-        for cid in to_close:
+    return len(user_tickets.get(user_id, ()))
+
+async def auto_close_sweep():
+    now = discord.utils.utcnow().timestamp()
+    claimed_after = admission.inactivity_for(claimed=True)
+    unclaimed_after = admission.inactivity_for(claimed=False)
+    to_close = [
+        cid for cid, ts in last_activity.items()
+        if now - ts > (claimed_after if cid in claimed_by else unclaimed_after)
+    ]
+
+    for cid in to_close:
+        with log_context(ticket=cid):
             channel = client.get_channel(cid)
             if not channel:
+                if cid not in closing_tickets:
+                    retire_ticket(cid, "deleted")
                 continue
 
             logs_id = ticket_config.get("logs_channel")
@@ -90,38 +224,44 @@ async def auto_close_task():
                 continue
 
             logs_channel = client.get_channel(logs_id)
+            owner_id = ticket_owners.get(cid, "Unknown")
 
-            try:
-                transcript_text = await generate_transcript(channel)
-
-                transcript_file = discord.File(
-                    fp=io.BytesIO(transcript_text.encode()),
-                    filename=f"transcript-{channel.name}.txt"
-                )
-
-                owner_id = ticket_owners.get(cid, "Unknown")
-
-                embed = discord.Embed(
-                    title="📝 Ticket Transcript",
-                    description=f"**Channel:** {channel.name}\n"
-                                f"**Closed by:** Auto-close (inactive)\n"
-                                f"**Owner ID:** {owner_id}",
-                    color=discord.Color.red(),
-                    timestamp=discord.utils.utcnow()
-                )
-
-                if logs_channel:
-                    await logs_channel.send(embed=embed, file=transcript_file)
-
-            except Exception as e:
-                logger.error(f"Failed to create transcript: {e}")
+            if not begin_close(cid):
+                continue
 
-            ticket_owners.pop(cid, None)
-            last_activity.pop(cid, None)
-            await channel.delete()
+            # also on cancellation: supervisor.stop() cancels a sweep that outlives the grace window
+            try:
+                try:
+                    transcript_text = await generate_transcript(channel)
+
+                    transcript_file = discord.File(
+                        fp=io.BytesIO(transcript_text.encode()),
+                        filename=f"transcript-{channel.name}.txt"
+                    )
+
+                    embed = discord.Embed(
+                        title="📝 Ticket Transcript",
+                        description=f"**Channel:** {channel.name}\n"
+                                    f"**Closed by:** Auto-close (inactive)\n"
+                                    f"**Owner ID:** {owner_id}",
+                        color=discord.Color.red(),
+                        timestamp=discord.utils.utcnow()
+                    )
+
+                    if logs_channel:
+                        await logs_channel.send(embed=embed, file=transcript_file)
+
+                except Exception as e:
+                    logger.error("Failed to create transcript: %s", e)
+
+                logger.info("Ticket %s auto-closed after inactivity", cid)
+                await finish_close(channel, "inactive")
+            except BaseException:
+                abort_close(cid)
+                raise
 
 # -------------------- PERSISTENT COMPONENTS --------------------
-class MainPanel(discord.ui.View):
+class MainPanel(TracedView):
     def __init__(self):
         super().__init__(timeout=None)
 
@@ -142,25 +282,28 @@ class MainPanel(discord.ui.View):
         category = interaction.guild.get_channel(ticket_config["category"])
         staff_role = interaction.guild.get_role(ticket_config["staff_role"])
 
-        existing = find_existing_ticket(interaction.guild, interaction.user.id)
-        if existing:
-            await interaction.response.send_message(
-                f"❌ You already have a ticket: {existing.mention}",
-                ephemeral=True
-            )
-            return
+        now = discord.utils.utcnow().timestamp()
+        reason = check_admission(
+            admission.limits,
+            count_user_tickets(interaction.user.id),
+            user_ticket_cooldown.get(interaction.user.id),
+            now
+        )
+
+        if reason:
+            # refused demand, so a replay can tell what a looser policy would have let in
+            analytics.record("ticket_rejected", user=interaction.user.id, reason=reason)
 
-        if count_user_tickets(interaction.user.id) >= MAX_TICKETS:
+        if reason == "limit":
+            existing = find_existing_ticket(interaction.guild, interaction.user.id)
             await interaction.response.send_message(
-                "❌ You reached maximum open tickets.",
+                f"❌ You reached maximum open tickets: {existing.mention}" if existing
+                else "❌ You reached maximum open tickets.",
                 ephemeral=True
             )
             return
 
-        now = discord.utils.utcnow().timestamp()
-        last = user_ticket_cooldown.get(interaction.user.id)
-
-        if last and now - last < TICKET_COOLDOWN:
+        if reason == "cooldown":
             await interaction.response.send_message(
                 "⏳ Please wait before opening another ticket.",
                 ephemeral=True
@@ -180,8 +323,10 @@ class MainPanel(discord.ui.View):
             overwrites=overwrites
         )
 
-        ticket_owners[channel.id] = interaction.user.id
-        last_activity[channel.id] = discord.utils.utcnow().timestamp()
+        register_ticket(channel.id, interaction.user.id)
+        analytics.record("ticket_open", channel=channel.id, user=interaction.user.id)
+        set_context(ticket=channel.id)
+        logger.info("Ticket %s opened by %s", channel.id, interaction.user.id)
 
         embed = discord.Embed(
             title="🎫 Crystal Hub • Tier Evaluation Ticket",
@@ -208,7 +353,7 @@ class MainPanel(discord.ui.View):
             ephemeral=True
         )
 #---------------------------------------------------------------
-class TierFormView(discord.ui.View):
+class TierFormView(TracedView):
     def __init__(self, channel_id: int):
         super().__init__(timeout=None)
         self.channel_id = channel_id
@@ -226,7 +371,7 @@ class TierFormView(discord.ui.View):
 
         await interaction.response.send_modal(TierModal(self))
 
-class TierModal(discord.ui.Modal, title="Tier Test Form"):
+class TierModal(TracedModal, title="Tier Test Form"):
 
     def __init__(self, parent_view: TierFormView):
         super().__init__()
@@ -265,7 +410,7 @@ class TierModal(discord.ui.Modal, title="Tier Test Form"):
             ephemeral=True
         )
 #---------------------------------------------------------------------------------------
-class StaffApplicationModal(discord.ui.Modal, title="Crystal Hub • Staff Application"):
+class StaffApplicationModal(TracedModal, title="Crystal Hub • Staff Application"):
 
     def __init__(self):
         super().__init__()
@@ -311,6 +456,7 @@ class StaffApplicationModal(discord.ui.Modal, title="Crystal Hub • Staff Appli
 
         application_times[interaction.user.id] = now
         active_applications[interaction.user.id] = True
+        analytics.record("application_submit", user=interaction.user.id)
 
         await interaction.response.defer(ephemeral=True)
 
@@ -341,7 +487,7 @@ class StaffApplicationModal(discord.ui.Modal, title="Crystal Hub • Staff Appli
 
 # ================= REJECT REASON MODAL =================
 
-class RejectReasonModal(discord.ui.Modal, title="Application Rejection Reason"):
+class RejectReasonModal(TracedModal, title="Application Rejection Reason"):
 
     reason = discord.ui.TextInput(
         label="Reason for rejection",
@@ -358,6 +504,7 @@ class RejectReasonModal(discord.ui.Modal, title="Application Rejection Reason"):
 
         # remove application lock
         active_applications.pop(self.applicant_id, None)
+        analytics.record("application_reject", user=self.applicant_id, staff=interaction.user.id)
 
         try:
             await user.send(
@@ -381,7 +528,7 @@ class RejectReasonModal(discord.ui.Modal, title="Application Rejection Reason"):
 
 # ================= REVIEW BUTTONS =================
 
-class ApplicationReviewView(discord.ui.View):
+class ApplicationReviewView(TracedView):
     def __init__(self, applicant_id: int):
         super().__init__(timeout=None)
         self.applicant_id = applicant_id
@@ -401,6 +548,7 @@ class ApplicationReviewView(discord.ui.View):
 
         self.handled = True
         active_applications.pop(self.applicant_id, None)
+        analytics.record("application_accept", user=self.applicant_id, staff=interaction.user.id)
 
         user = interaction.guild.get_member(self.applicant_id)
         if not user:
@@ -448,7 +596,7 @@ class ApplicationReviewView(discord.ui.View):
         await interaction.response.send_modal(RejectReasonModal(self.applicant_id))
 # ================= APPLICATION PANEL =================
 
-class ApplicationPanel(discord.ui.View):
+class ApplicationPanel(TracedView):
     def __init__(self):
         super().__init__(timeout=None)
 
@@ -465,7 +613,7 @@ class ApplicationPanel(discord.ui.View):
 
         await interaction.response.send_modal(StaffApplicationModal())
 
-class TicketButtons(discord.ui.View):
+class TicketButtons(TracedView):
     def __init__(self):
         super().__init__(timeout=None)
 
@@ -486,6 +634,7 @@ class TicketButtons(discord.ui.View):
             return
 
         claimed_by[interaction.channel.id] = interaction.user.id
+        analytics.record("ticket_claim", channel=interaction.channel.id, staff=interaction.user.id)
 
         async for msg in interaction.channel.history(limit=5):
             if msg.embeds:
@@ -518,23 +667,33 @@ class TicketButtons(discord.ui.View):
             ephemeral=True
         )
 
-class ConfirmCloseView(discord.ui.View):
+class ConfirmCloseView(TracedView):
     def __init__(self):
         super().__init__(timeout=30)
 
     @discord.ui.button(label="Confirm Close", style=discord.ButtonStyle.red)
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_message("🔒 Closing...", ephemeral=True)
+        if not begin_close(interaction.channel.id):
+            await interaction.response.send_message("Ticket is already closing.", ephemeral=True)
+            return
+
+        try:
+            await interaction.response.send_message("🔒 Closing...", ephemeral=True)
+
+            transcript = await generate_transcript(interaction.channel)
+            file = discord.File(io.BytesIO(transcript.encode()), filename="transcript.txt")
 
-        transcript = await generate_transcript(interaction.channel)
-        file = discord.File(io.BytesIO(transcript.encode()), filename="transcript.txt")
+            logs = interaction.guild.get_channel(ticket_config["logs_channel"])
+            if logs:
+                await logs.send(f"Transcript of {interaction.channel.name}", file=file)
 
-        logs = interaction.guild.get_channel(ticket_config["logs_channel"])
-        if logs:
-            await logs.send(f"Transcript of {interaction.channel.name}", file=file)
+            logger.info("Ticket %s closed by %s", interaction.channel.id, interaction.user.id)
 
-        await asyncio.sleep(2)
-        await interaction.channel.delete()
+            await asyncio.sleep(2)
+            await finish_close(interaction.channel, "staff")
+        except BaseException:
+            abort_close(interaction.channel.id)
+            raise
 
     @discord.ui.button(label="Cancel", style=discord.ButtonStyle.gray)
     async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -545,17 +704,35 @@ class ConfirmCloseView(discord.ui.View):
 @client.event
 async def on_ready():
     load_config()
+    analytics.load()
+    warns.load()
+    admission.overrides = dict(ticket_config.get("limit_overrides", {}))
+
+    guild = client.get_guild(GUILD_ID)
+    if guild:
+        load_tickets(guild)
 
     # REGISTER ALL PERSISTENT VIEWS
     client.add_view(MainPanel())
     client.add_view(TicketButtons())
     client.add_view(ApplicationPanel())
 
-    asyncio.create_task(auto_close_task())
-    asyncio.create_task(warn_checker())
+    if mirror:
+        await mirror.start()
+
+    supervisor.start()
 
     await tree.sync(guild=discord.Object(id=GUILD_ID))
-    print("✅ Crystal Hub Bot Ready")
+    logger.info("Crystal Hub Bot ready as %s", client.user)
+
+@client.event
+async def on_resumed():
+    supervisor.start()
+
+@client.event
+async def on_disconnect():
+    logger.warning("Gateway disconnected, pausing background workers")
+    await supervisor.stop()
 
 @client.event
 async def on_message(message):
@@ -565,13 +742,30 @@ async def on_message(message):
     # update ticket activity
     if message.channel.id in ticket_owners:
         last_activity[message.channel.id] = discord.utils.utcnow().timestamp()
+        set_context(correlation=f"msg-{message.id}", ticket=message.channel.id)
+        logger.debug(
+            "Ticket activity from %s in %s", message.author.id, message.channel.id,
+            extra={"sample": "on_message"}
+        )
+
+        # mirror evidence while the CDN links are still valid
+        if mirror:
+            for attachment in message.attachments:
+                mirror.schedule(attachment.url, attachment.filename)
 
     # warn system
-    if message.channel.id in warn_waiting:
-        data = warn_waiting[message.channel.id]
-        if message.author.id == data["user"]:
-            del warn_waiting[message.channel.id]
-            await message.channel.send("✅ User replied. Warning cleared.")
+    cleared = warns.resolve(message.channel.id, message.author.id)
+    if cleared:
+        await message.channel.send(
+            "✅ User replied. Warning cleared." if len(cleared) == 1
+            else f"✅ User replied. {len(cleared)} warnings cleared."
+        )
+
+@client.event
+async def on_guild_channel_delete(channel):
+    # deleted by hand in Discord; bot closes in flight record their own close
+    if channel.id in ticket_owners and channel.id not in closing_tickets:
+        retire_ticket(channel.id, "deleted")
 
 # -------------------- COMMANDS --------------------
 @tree.command(
@@ -579,47 +773,141 @@ async def on_message(message):
     description="Warn user in ticket",
     guild=discord.Object(id=GUILD_ID)
 )
-async def warn(interaction: discord.Interaction, user: discord.Member, minutes: int, reason: str):
+@app_commands.describe(channel="Ticket to warn in (defaults to this ticket or the user's only ticket)")
+async def warn(
+    interaction: discord.Interaction,
+    user: discord.Member,
+    minutes: int,
+    reason: str,
+    channel: discord.TextChannel | None = None,
+):
 
-    channel = find_existing_ticket(interaction.guild, user.id)
-    if not channel:
+    if channel is None:
+        if ticket_owners.get(interaction.channel_id) == user.id:
+            channel = interaction.channel
+        elif count_user_tickets(user.id) > 1:
+            await interaction.response.send_message(
+                "User has several tickets. Pick one with the `channel` option.",
+                ephemeral=True
+            )
+            return
+        else:
+            channel = find_existing_ticket(interaction.guild, user.id)
+
+    if not channel or ticket_owners.get(channel.id) != user.id:
         await interaction.response.send_message("No ticket found.", ephemeral=True)
         return
 
-    await channel.send(
-        f"{user.mention}⚠️ {reason}\nReply within **{minutes} minutes** or ticket closes."
+    # registered before the await so a close racing this command also drops the warning
+    ladder = ticket_config.get("warn_ladder", DEFAULT_LADDER)
+    warning = warns.add(channel.id, user.id, reason, minutes, ladder)
+
+    try:
+        await channel.send(
+            f"{user.mention}⚠️ {reason}\nReply within **{minutes} minutes**. "
+            f"If you don't: {format_schedule(minutes, ladder)}."
+        )
+    except discord.HTTPException as e:
+        # never escalate over a warning the user did not see
+        warns.discard(warning["id"])
+        logger.warning("Could not deliver warning to %s in %s: %s", user.id, channel.id, e)
+        await interaction.response.send_message(f"❌ Could not send the warning: {e.text or e}", ephemeral=True)
+        return
+
+    analytics.record("warn_issued", channel=channel.id, user=user.id)
+    logger.info("Warning %s issued to %s in %s", warning["id"], user.id, channel.id)
+    await interaction.response.send_message(
+        f"Warn sent. Pending warnings for {user.mention} here: {len(warns.pending(channel.id, user.id))}",
+        ephemeral=True
     )
 
-    warn_waiting[channel.id] = {
-        "user": user.id,
-        "end": discord.utils.utcnow().timestamp() + (minutes * 60)
-    }
+@tree.command(name="warn_config", description="Configure the warning escalation ladder", guild=discord.Object(id=GUILD_ID))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(
+    ladder="Steps as action:minutes, e.g. reminder:0,timeout:5,close:0",
+    timeout_minutes="Length of the timeout step"
+)
+async def warn_config(interaction: discord.Interaction, ladder: str | None = None, timeout_minutes: int | None = None):
+
+    if ladder is not None:
+        try:
+            ticket_config["warn_ladder"] = parse_ladder(ladder)
+        except ValueError as e:
+            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            return
 
-    await interaction.response.send_message("Warn sent.", ephemeral=True)
+    if timeout_minutes is not None:
+        ticket_config["warn_timeout_minutes"] = max(1, timeout_minutes)
 
-async def warn_checker():
-    while True:
-        await asyncio.sleep(15)
-        now = discord.utils.utcnow().timestamp()
+    save_config()
+
+    await interaction.response.send_message(
+        f"⚙️ Escalation: {format_ladder(ticket_config.get('warn_ladder', DEFAULT_LADDER))}\n"
+        f"Timeout length: **{ticket_config.get('warn_timeout_minutes', 60)} minutes**",
+        ephemeral=True
+    )
+
+async def escalate_warning(warning: dict, step: dict):
+    cid = warning["channel"]
+    if cid not in ticket_owners:
+        # the ticket was closed; forget_ticket already dropped its warnings
+        return
+
+    channel = client.get_channel(cid)
+    if not channel:
+        # not in the cache yet (e.g. right after a restart); try again shortly
+        warns.retry(warning, step)
+        return
 
-        for cid, data in list(warn_waiting.items()):
-            if now > data["end"]:
-                channel = client.get_channel(cid)
-                if not channel:
-                    del warn_waiting[cid]
-                    continue
+    if cid in closing_tickets:
+        # a close is in flight; if it fails the ticket is still open and the step fires again
+        warns.retry(warning, step)
+        return
 
-                member = channel.guild.get_member(data["user"])
-                if not member:
-                    del warn_waiting[cid]
-                    continue
+    member = channel.guild.get_member(warning["user"])
+    if not member:
+        warns.resolve(cid, warning["user"])
+        return
 
-                await channel.send("⏰ No response. Ticket closing and user timed out.")
+    if step["action"] == "reminder":
+        await channel.send(f"{member.mention} ⏰ Reminder: please reply to the warning above.")
 
-                await member.timeout(datetime.timedelta(hours=1))
-                await channel.delete()
+    elif step["action"] == "timeout":
+        minutes = ticket_config.get("warn_timeout_minutes", 60)
+        await channel.send(f"⏰ No response. {member.mention} timed out for {minutes} minutes.")
+        await member.timeout(datetime.timedelta(minutes=minutes))
 
-                del warn_waiting[cid]
+    elif step["action"] == "close":
+        if not begin_close(cid):
+            return
+        logger.info("Ticket %s closed after unanswered warning to %s", cid, member.id)
+        try:
+            await channel.send("⏰ No response. Ticket closing.")
+        finally:
+            await finish_close(channel, "warn")
+
+async def fire_due_warnings():
+    # pop_due() already advanced the whole batch, so every step must either run or be put back
+    due = warns.pop_due()
+    for i, (warning, step) in enumerate(due):
+        if not warns.is_current(warning, step):
+            continue
+        with log_context(ticket=warning["channel"]):
+            try:
+                await escalate_warning(warning, step)
+            except (discord.Forbidden, discord.NotFound) as e:
+                # retrying will not help (missing permissions, member or channel gone)
+                logger.warning("Warning %s step %s failed: %s", warning["id"], step["action"], e)
+            except asyncio.CancelledError:
+                # latest first, so each warning ends up back at its earliest unfinished step
+                unfinished = [(w, s) for w, s in due[i:] if warns.is_current(w, s) and w["channel"] in ticket_owners]
+                for pending, pending_step in reversed(unfinished):
+                    warns.retry(pending, pending_step, delay=0)
+                raise
+            except Exception as e:
+                logger.error("Warning %s step %s failed, retrying", warning["id"], step["action"], exc_info=e)
+                if warning["channel"] in ticket_owners:
+                    warns.retry(warning, step)
 
 @tree.command(name="tier", description="Post official tier result", guild=discord.Object(id=GUILD_ID))
 @app_commands.describe(
@@ -710,8 +998,17 @@ Test again in **1 month!**
     embed = discord.Embed(description=result_text, color=discord.Color.gold())
     embed.set_image(url="https://media.giphy.com/media/oWWA8hYwrlk8Yrp6lo/giphy.gif")
     await interaction.response.send_message(embed=embed)
+    analytics.record(
+        "tier_result",
+        tester=tester.id,
+        user=user.id,
+        mode=mode.value,
+        region=region.value,
+        result=result.value,
+        earned_tier=earned_tier
+    )
     # Log the action
-    logger.info(f"Tier result posted by {interaction.user}: Tester {tester}, User {user}, Result {result.value}")
+    logger.info("Tier result posted by %s: Tester %s, User %s, Result %s", interaction.user, tester, user, result.value)
 
 @tree.command(name="setup_tickets", description="Setup ticket system", guild=discord.Object(id=GUILD_ID))
 @app_commands.checks.has_permissions(administrator=True)
@@ -739,7 +1036,66 @@ async def setup_tickets(
     embed.set_footer(text="✅ Configuration completed", icon_url=interaction.user.avatar.url if interaction.user.avatar else None)
     await interaction.response.send_message(embed=embed, ephemeral=True)
     # Log the setup
-    logger.info(f"Ticket system configured by {interaction.user}: Category {category.name}, Staff Role {staff_role.name}, Logs Channel {logs_channel.name}")
+    logger.info(
+        "Ticket system configured by %s: Category %s, Staff Role %s, Logs Channel %s",
+        interaction.user, category.name, staff_role.name, logs_channel.name
+    )
+
+@tree.command(name="ticket_limits", description="View or override adaptive ticket limits", guild=discord.Object(id=GUILD_ID))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(
+    max_tickets="Pin open tickets per user",
+    cooldown_seconds="Pin seconds between tickets per user",
+    inactivity_minutes="Pin minutes before an idle ticket auto-closes",
+    reset="Drop all overrides and return to adaptive limits"
+)
+async def ticket_limits(
+    interaction: discord.Interaction,
+    max_tickets: app_commands.Range[int, 1, 10] | None = None,
+    cooldown_seconds: app_commands.Range[int, 0, 86400] | None = None,
+    inactivity_minutes: app_commands.Range[int, 1, 1440] | None = None,
+    reset: bool = False,
+):
+
+    if reset:
+        admission.overrides.clear()
+    if max_tickets is not None:
+        admission.set_override("max_tickets", max_tickets)
+    if cooldown_seconds is not None:
+        admission.set_override("cooldown", cooldown_seconds)
+    if inactivity_minutes is not None:
+        admission.set_override("inactivity", inactivity_minutes * 60)
+
+    ticket_config["limit_overrides"] = admission.overrides
+    save_config()
+
+    limits = admission.limits
+    inputs = admission.inputs
+
+    embed = discord.Embed(
+        title="🎚️ Ticket Limits",
+        description=(
+            f"Level: **{admission.level_name}** (pressure {admission.pressure:.2f})\n"
+            f"Open tickets {inputs['open']} • testers online {inputs['staff_online']} • "
+            f"closes/hour {inputs['closes_per_hour']:.1f}"
+        ),
+        color=discord.Color.orange()
+    )
+
+    def shown(key, value):
+        return f"{value} (override)" if key in admission.overrides else str(value)
+
+    embed.add_field(name="Tickets per User", value=shown("max_tickets", limits["max_tickets"]))
+    embed.add_field(name="Cooldown", value=shown("cooldown", format_duration(limits["cooldown"])))
+    claimed_after = admission.inactivity_for(claimed=True)
+    unclaimed_after = admission.inactivity_for(claimed=False)
+    inactivity = format_duration(claimed_after)
+    if unclaimed_after != claimed_after:
+        inactivity = f"{inactivity} claimed • {format_duration(unclaimed_after)} unclaimed"
+    embed.add_field(name="Inactivity Close", value=shown("inactivity", inactivity))
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+    logger.info("Ticket limit overrides set by %s: %s", interaction.user, admission.overrides)
 
 @tree.command(name="stats", description="Bot statistics", guild=discord.Object(id=GUILD_ID))
 async def stats(interaction: discord.Interaction):
@@ -752,9 +1108,105 @@ async def stats(interaction: discord.Interaction):
     embed.add_field(name="Open Tickets", value=str(len(ticket_owners)))
     embed.add_field(name="Claimed Tickets", value=str(len(claimed_by)))
     embed.add_field(name="Pending Applications", value=str(len(active_applications)))
-    embed.add_field(name="Warnings Active", value=str(len(warn_waiting)))
+    embed.add_field(name="Warnings Active", value=str(len(warns.warnings)))
+    embed.add_field(name="Load Level", value=f"{admission.level_name} ({admission.inputs['staff_online']} testers online)")
+
+    overview = analytics.overview()
+    embed.add_field(name="Opened (24h)", value=str(overview["opened_24h"]))
+    embed.add_field(name="Closed (24h)", value=str(overview["closed_24h"]))
+    embed.add_field(name="Tier Tests", value=str(analytics.totals["tier_result"]))
+    embed.add_field(name="Median Time to Claim", value=format_duration(overview["median_claim"]))
+    embed.add_field(name="Median Time to Close", value=format_duration(overview["median_close"]))
+
+    now = discord.utils.utcnow().timestamp()
+    for health in supervisor.health():
+        icon = {"idle": "🟢", "running": "🔵", "backoff": "🟠"}.get(health["state"], "⚫")
+        last_run = "never" if health["last_run"] is None else f"{format_duration(now - health['last_run'])} ago"
+        lines = [
+            f"{icon} {health['state']} • last run {last_run}",
+            f"took {health['last_duration'] * 1000:.0f} ms" if health["last_duration"] is not None else "not run yet",
+            f"runs {health['runs']} • errors {health['errors']} • restarts {health['restarts']}",
+        ]
+        if health["last_error"]:
+            lines.append(f"last error: `{health['last_error'][:200]}`")
+        embed.add_field(name=f"⚙️ {health['name']}", value="\n".join(lines), inline=False)
 
     await interaction.response.send_message(embed=embed)
+
+@tree.command(name="analytics", description="Ticket, tester and tier analytics", guild=discord.Object(id=GUILD_ID))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(view="Which report to show", export="Attach the report as CSV")
+@app_commands.choices(
+    view=[
+        app_commands.Choice(name="Overview", value="overview"),
+        app_commands.Choice(name="Tickets per hour", value="tickets"),
+        app_commands.Choice(name="Testers", value="testers"),
+        app_commands.Choice(name="Tiers by mode & region", value="tiers"),
+    ]
+)
+async def analytics_command(
+    interaction: discord.Interaction,
+    view: app_commands.Choice[str],
+    export: bool = False,
+):
+    embed = discord.Embed(
+        title=f"📈 Crystal Hub Analytics • {view.name}",
+        color=discord.Color.purple(),
+        timestamp=discord.utils.utcnow()
+    )
+
+    if view.value == "overview":
+        overview = analytics.overview()
+        embed.add_field(name="Opened (1h / 24h)", value=f"{overview['opened_1h']} / {overview['opened_24h']}")
+        embed.add_field(name="Closed (1h / 24h)", value=f"{overview['closed_1h']} / {overview['closed_24h']}")
+        embed.add_field(
+            name="Time to Claim (p50 / p90)",
+            value=f"{format_duration(overview['median_claim'])} / {format_duration(overview['p90_claim'])}"
+        )
+        embed.add_field(
+            name="Time to Close (p50 / p90)",
+            value=f"{format_duration(overview['median_close'])} / {format_duration(overview['p90_close'])}"
+        )
+        embed.add_field(
+            name="Applications",
+            value=f"{overview['applications']} submitted • {overview['accepted']} accepted • {overview['rejected']} rejected",
+            inline=False
+        )
+
+    elif view.value == "tickets":
+        lines = []
+        for bucket, counts in analytics.hourly.series(discord.utils.utcnow().timestamp(), 12):
+            hour = datetime.datetime.fromtimestamp(bucket, datetime.timezone.utc).strftime("%H:00")
+            lines.append(f"`{hour}` opened **{counts['ticket_open']}** • closed **{counts['ticket_close']}**")
+        embed.description = "\n".join(lines)
+
+    elif view.value == "testers":
+        lines = [
+            f"<@{tester}> — **{count}** tests"
+            for tester, count in analytics.tester_tests.most_common(15)
+        ]
+        embed.description = "\n".join(lines) or "No tier results yet."
+
+    else:
+        for (mode, region), tiers in sorted(analytics.tiers.items())[:25]:
+            results = analytics.results[(mode, region)]
+            top = ", ".join(f"{tier}×{count}" for tier, count in tiers.most_common(5))
+            embed.add_field(
+                name=f"{mode} • {region}",
+                value=f"W {results['WON']} / L {results['LOST']}\n{top}",
+                inline=False
+            )
+        if not analytics.tiers:
+            embed.description = "No tier results yet."
+
+    if export:
+        file = discord.File(
+            io.BytesIO(analytics.export_csv(view.value).encode()),
+            filename=f"analytics-{view.value}.csv"
+        )
+        await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
     
 @tree.command(name="application_panel", description="Send staff application panel", guild=discord.Object(id=GUILD_ID))
 async def application_panel(interaction: discord.Interaction):
@@ -821,4 +1273,31 @@ async def panel(interaction: discord.Interaction):
     await interaction.channel.send(embed=embed, view=MainPanel())
     await interaction.response.send_message("✅ Panel sent.", ephemeral=True)
     
-client.run(TOKEN)
+async def update_capacity():
+    staff_online = 0
+    guild = client.get_guild(GUILD_ID)
+    if guild and "staff_role" in ticket_config:
+        staff_role = guild.get_role(ticket_config["staff_role"])
+        if staff_role:
+            staff_online = sum(1 for m in staff_role.members if m.status != discord.Status.offline)
+
+    previous = (admission.level_name, admission.inputs["staff_online"])
+    level = admission.update(len(ticket_owners), staff_online)
+
+    if (level, staff_online) != previous:
+        analytics.record("capacity", open=len(ticket_owners), staff_online=staff_online, level=level)
+        logger.info(
+            "Admission level %s (open %d, testers online %d, pressure %.2f)",
+            level, len(ticket_owners), staff_online, admission.pressure
+        )
+
+async def snapshot_analytics():
+    analytics.snapshot()
+
+supervisor.add("auto_close", auto_close_sweep, interval=60)
+supervisor.add("warn_checker", fire_due_warnings, wait=lambda: warns.wait_due())
+supervisor.add("capacity", update_capacity, interval=CAPACITY_INTERVAL)
+supervisor.add("analytics_snapshot", snapshot_analytics, interval=SNAPSHOT_INTERVAL)
+
+if __name__ == "__main__":
+    client.run(TOKEN, log_handler=None)
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import aiohttp
+
+logger = logging.getLogger("crystalhub.mirror")
+
+INDEX_FILE = "index.json"
+PARTIAL_PREFIX = ".partial-"
+CHUNK_SIZE = 64 * 1024
+
+
+def url_key(url: str) -> str:
+    # Discord CDN links carry expiring signature params; the path alone is stable.
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+class AttachmentMirror:
+    """Content-addressed local copies of ticket attachments with an LRU size cap."""
+
+    def __init__(self, root: str, max_bytes: int, concurrency: int = 4, session: aiohttp.ClientSession | None = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.concurrency = concurrency
+        self.session = session
+        self._own_session = session is None
+
+        self.blobs = OrderedDict()   # digest -> {"size", "name"}, least recently used first
+        self.urls = {}               # url key -> digest
+        self.total_bytes = 0
+        self._inflight = {}
+
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    # -------------------- INDEX --------------------
+
+    def _index_path(self) -> str:
+        return os.path.join(self.root, INDEX_FILE)
+
+    def _load_index(self):
+        if os.path.exists(self._index_path()):
+            with open(self._index_path()) as f:
+                data = json.load(f)
+            for digest, blob in data.get("blobs", []):
+                if os.path.exists(self._blob_path(digest, blob["name"])):
+                    self.blobs[digest] = blob
+                    self.total_bytes += blob["size"]
+            self.urls = {k: d for k, d in data.get("urls", {}).items() if d in self.blobs}
+
+        if self._recover():
+            self._evict()
+            self._save_index()
+
+    def _recover(self) -> bool:
+        """Reconcile the index with the files on disk after a crash.
+
+        Interrupted downloads are removed. Blobs moved into place without the
+        index being saved are adopted as least recently used, so they go first.
+        """
+        changed = False
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(PARTIAL_PREFIX):
+                os.remove(entry.path)
+                changed = True
+            elif entry.is_dir() and len(entry.name) == 2:
+                for blob in os.scandir(entry.path):
+                    digest, _ = os.path.splitext(blob.name)
+                    if digest not in self.blobs:
+                        self.blobs[digest] = {"size": blob.stat().st_size, "name": blob.name}
+                        self.blobs.move_to_end(digest, last=False)
+                        self.total_bytes += self.blobs[digest]["size"]
+                    elif blob.path != self._blob_path(digest, self.blobs[digest]["name"]):
+                        os.remove(blob.path)
+                    else:
+                        continue
+                    changed = True
+        if changed:
+            logger.info("Recovered mirror index from disk (%d blobs)", len(self.blobs))
+        return changed
+
+    def _save_index(self):
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"blobs": list(self.blobs.items()), "urls": self.urls}, f)
+        os.replace(tmp, self._index_path())
+
+    def _blob_path(self, digest: str, name: str) -> str:
+        _, ext = os.path.splitext(name)
+        return os.path.join(self.root, digest[:2], digest + ext.lower())
+
+    def relative_path(self, digest: str) -> str:
+        return os.path.relpath(self._blob_path(digest, self.blobs[digest]["name"]), self.root)
+
+    # -------------------- LIFECYCLE --------------------
+
+    async def start(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            self.session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self._inflight:
+            await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+        if self._own_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    # -------------------- MIRRORING --------------------
+
+    def schedule(self, url: str, filename: str) -> asyncio.Task:
+        """Start mirroring in the background; concurrent calls share one download."""
+        key = url_key(url)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._mirror(key, url, filename))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def fetch(self, url: str, filename: str) -> str | None:
+        """Return the local relative path for ``url``, downloading it if needed."""
+        digest = self.urls.get(url_key(url))
+        if digest in self.blobs:
+            self.blobs.move_to_end(digest)
+            return self.relative_path(digest)
+        return await self.schedule(url, filename)
+
+    async def _mirror(self, key: str, url: str, filename: str) -> str | None:
+        await self.start()
+        hasher = hashlib.sha256()
+        tmp = os.path.join(self.root, f"{PARTIAL_PREFIX}{hashlib.sha1(key.encode()).hexdigest()}")
+        size = 0
+
+        try:
+            async with self.session.get(url) as resp:
+                resp.raise_for_status()
+                with open(tmp, "wb") as f:
+                    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise ValueError("attachment larger than mirror capacity")
+                        hasher.update(chunk)
+                        f.write(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, OSError) as e:
+            logger.warning("Failed to mirror %s: %s", url, e)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return None
+
+        digest = hasher.hexdigest()
+        path = self._blob_path(digest, filename)
+        if digest in self.blobs:
+            os.remove(tmp)
+            self.blobs.move_to_end(digest)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+            self.blobs[digest] = {"size": size, "name": filename}
+            self.total_bytes += size
+
+        self.urls[key] = digest
+        self._evict()
+        self._save_index()
+        return self.relative_path(digest) if digest in self.blobs else None
+
+    def _evict(self):
+        evicted = set()
+        while self.total_bytes > self.max_bytes and self.blobs:
+            digest, blob = self.blobs.popitem(last=False)
+            self.total_bytes -= blob["size"]
+            evicted.add(digest)
+            try:
+                os.remove(self._blob_path(digest, blob["name"]))
+            except FileNotFoundError:
+                pass
+        if evicted:
+            self.urls = {k: d for k, d in self.urls.items() if d not in evicted}
+            logger.info("Evicted %d mirrored attachments", len(evicted))
@@ -0,0 +1,393 @@
+"""Scripted self-checks for the analytics engine and the attachment mirror.
+
+Each check builds its inputs from a fixed seed and compares the streaming
+aggregates against values computed the slow, obvious way. The mirror checks
+download from a local HTTP stand-in for the Discord CDN.
+
+    python selfcheck.py
+    python selfcheck.py --only quantiles buckets
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web  # noqa: E402
+
+from analytics import Analytics, BucketCounter, P2Quantile  # noqa: E402
+from mirror import AttachmentMirror  # noqa: E402
+
+START_TIME = 1_700_000_000 // 3600 * 3600
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def expect(condition: bool, message: str):
+    if not condition:
+        raise CheckFailed(message)
+
+
+def exact_quantile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class FakeClock:
+    def __init__(self, now: float = START_TIME):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+# -------------------- ANALYTICS --------------------
+
+def check_quantiles():
+    rng = random.Random(0)
+    distributions = {
+        "uniform": lambda: rng.uniform(0, 3600),
+        "exponential": lambda: rng.expovariate(1 / 900),
+        "lognormal": lambda: rng.lognormvariate(6, 1),
+    }
+    for name, draw in distributions.items():
+        values = [draw() for _ in range(10_000)]
+        ordered = sorted(values)
+        for q in (0.5, 0.9):
+            sketch = P2Quantile(q)
+            for x in values:
+                sketch.add(x)
+            # judge by rank, so the tolerance means the same thing for every distribution
+            rank = sum(1 for x in ordered if x <= sketch.value()) / len(ordered)
+            expect(abs(rank - q) < 0.02,
+                   f"{name} p{int(q * 100)}: estimate {sketch.value():.1f} sits at rank {rank:.3f}, "
+                   f"exact {exact_quantile(values, q):.1f}")
+
+    # below five samples the sketch is exact
+    for n in range(1, 6):
+        values = [rng.uniform(0, 100) for _ in range(n)]
+        sketch = P2Quantile(0.5)
+        for x in values:
+            sketch.add(x)
+        expect(sketch.value() == exact_quantile(values, 0.5), f"median of {n} samples is not exact")
+    expect(P2Quantile(0.5).value() is None, "empty sketch should have no value")
+
+
+def check_buckets():
+    clock = FakeClock()
+    analytics = Analytics(os.devnull, clock=clock)
+    times = [START_TIME + m * 60 + 1 for m in range(180)]
+    for ts in times:
+        analytics._apply({"ts": ts, "kind": "ticket_open", "channel": ts})
+
+    for now_offset in (179 * 60 + 30, 150 * 60 + 45, 90 * 60 + 59):
+        now = START_TIME + now_offset
+        for seconds in (600, 3600, 86400):
+            expected = sum(1 for ts in times if now - seconds < ts <= now)
+            got = analytics.last("ticket_open", seconds, now)
+            # minute buckets: the one straddling the window start is dropped
+            expect(expected - 1 <= got <= expected,
+                   f"last {seconds}s at +{now_offset}s counted {got}, expected {expected}")
+
+    # the hourly series used for the CSV and chart adds up to every event
+    series = list(analytics.hourly.series(START_TIME + 179 * 60, 3))
+    expect([b for b, _ in series] == [START_TIME + h * 3600 for h in range(3)], "hourly series misaligned")
+    expect(sum(c["ticket_open"] for _, c in series) == len(times), "hourly series lost events")
+
+    # hourly buckets at half past: one hour back is only this hour, 90 minutes reaches the last
+    counter = BucketCounter(3600)
+    counter.add(START_TIME + 10, "x")
+    counter.add(START_TIME + 3600 + 10, "x")
+    now = START_TIME + 3600 + 1800
+    expect(counter.total("x", now, 3600) == 1, "one-hour window must not include the hour before")
+    expect(counter.total("x", now, 5400) == 1, "bucket straddling the window start should be left out")
+    expect(counter.total("x", now, 5401) == 2, "window reaching the previous hour lost it")
+
+
+def check_retention():
+    counter = BucketCounter(3600, retention=24)
+    for h in range(48):
+        counter.add(START_TIME + h * 3600 + 10, "x")
+    newest = START_TIME + 47 * 3600
+    expect(len(counter.buckets) <= 24, f"kept {len(counter.buckets)} hourly buckets, retention is 24")
+    expect(min(counter.buckets) > newest - 24 * 3600, "kept a bucket older than the retention window")
+
+    # a day and a half of minute-by-minute traffic: the 24h count still matches
+    clock = FakeClock()
+    analytics = Analytics(os.devnull, clock=clock)
+    for m in range(36 * 60):
+        analytics._apply({"ts": START_TIME + m * 60 + 1, "kind": "ticket_open", "channel": m})
+    now = START_TIME + 36 * 60 * 60
+    expect(len(analytics.recent.buckets) <= 24 * 60, "minute counter outgrew its retention")
+    expect(analytics.last("ticket_open", 86400, now) >= 24 * 60 - 1, "24h count wrong after pruning")
+
+
+def check_export():
+    clock = FakeClock(START_TIME + 5 * 3600)
+    analytics = Analytics(os.devnull, clock=clock)
+    for i in range(10):
+        analytics._apply({"ts": START_TIME + i * 1800, "kind": "ticket_open", "channel": i})
+        analytics._apply({"ts": START_TIME + i * 1800 + 60, "kind": "ticket_claim", "channel": i, "staff": 1})
+    analytics._apply({"ts": START_TIME, "kind": "tier_result", "mode": "sword", "region": "EU",
+                      "tester": 5, "result": "WON", "earned_tier": "HT3"})
+
+    rows = analytics.export_csv("tickets").splitlines()
+    expect(rows[0] == "hour_utc,ticket_open,ticket_claim,ticket_close", "tickets header changed")
+    expect(len(rows) == 1 + 24 * 7, f"tickets export has {len(rows) - 1} hours, expected a week")
+    expect(sum(int(r.split(",")[1]) for r in rows[1:]) == 10, "tickets export lost opens")
+
+    expect(analytics.export_csv("testers").splitlines() == ["tester_id,tests", "5,1"], "testers export wrong")
+    expect(analytics.export_csv("tiers").splitlines()[1] == "sword,EU,1,0,HT3,1", "tiers export wrong")
+    summary = dict(r.split(",") for r in analytics.export_csv("summary").splitlines()[1:])
+    expect(summary["median_claim"] == "60.0", f"summary median_claim is {summary['median_claim']}")
+
+
+def check_snapshot():
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "events.jsonl")
+        snapshot_path = os.path.join(workdir, "analytics.json")
+        clock = FakeClock()
+
+        def fresh():
+            analytics = Analytics(path, clock=clock, snapshot_path=snapshot_path)
+            analytics.load()
+            return analytics
+
+        def same(a, b) -> bool:
+            return (a.overview() == b.overview() and a.totals == b.totals and a.tester_tests == b.tester_tests
+                    and a.tiers == b.tiers and a.open_tickets() == b.open_tickets()
+                    and a.recent.buckets == b.recent.buckets and a.hourly.buckets == b.hourly.buckets)
+
+        live = fresh()
+        for i in range(300):
+            clock.now += rng.uniform(0, 300)
+            live.record("ticket_open", channel=i, user=rng.randrange(20))
+            if i == 150:
+                live.snapshot()
+            if i % 3 == 0:
+                live.record("ticket_claim", channel=i, staff=1)
+            if i >= 5:
+                live.record("ticket_close", channel=i - 5, reason="staff")
+            live.record("tier_result", mode="sword", region="EU", tester=rng.randrange(3),
+                        result=rng.choice(["WON", "LOST"]), earned_tier="LT3")
+
+        with open(snapshot_path) as f:
+            offset = json.load(f)["offset"]
+        expect(0 < offset < os.path.getsize(path), "snapshot should cover only part of the log")
+        expect(same(fresh(), live), "snapshot plus log tail differs from live aggregates")
+
+        live.snapshot()
+        expect(same(fresh(), live), "restoring an up-to-date snapshot differs from live aggregates")
+
+        # a rotated log no longer matches the snapshot: replay it from the start instead
+        with open(path) as f:
+            lines = f.readlines()
+        with open(path, "w") as f:
+            f.writelines(lines[len(lines) // 2:])
+        rebuilt = fresh()
+        expect(rebuilt.totals.total() == len(lines) - len(lines) // 2, "rotated log was not replayed in full")
+
+        with open(snapshot_path, "w") as f:
+            f.write("{not json")
+        expect(fresh().totals.total() == len(lines) - len(lines) // 2, "corrupt snapshot broke loading")
+
+        # snapshots are never written before load(), or the offset would skip unapplied events
+        unloaded = Analytics(path, clock=clock, snapshot_path=snapshot_path + ".unloaded")
+        unloaded.snapshot()
+        expect(not os.path.exists(snapshot_path + ".unloaded"), "snapshot written before load()")
+
+
+# -------------------- MIRROR --------------------
+
+class FakeCDN:
+    """Serves fixed bodies by path and counts the requests it gets."""
+
+    def __init__(self, files: dict[str, bytes]):
+        self.files = files
+        self.hits = {}
+        self.base = None
+        self._runner = None
+
+    async def _handle(self, request):
+        self.hits[request.path] = self.hits.get(request.path, 0) + 1
+        await asyncio.sleep(0.01)
+        body = self.files.get(request.path)
+        if body is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=body)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+    def url(self, path: str, sig: str = "a") -> str:
+        return f"{self.base}{path}?ex={sig}"
+
+
+def blob_files(root: str) -> list[str]:
+    return sorted(
+        os.path.join(d, f) for d in os.listdir(root) if os.path.isdir(os.path.join(root, d))
+        for f in os.listdir(os.path.join(root, d))
+    )
+
+
+def check_mirror_dedupe():
+    async def run():
+        body = os.urandom(5000)
+        files = {"/a/evidence.png": body, "/b/copy.png": body}
+        with tempfile.TemporaryDirectory() as root:
+            async with FakeCDN(files) as cdn:
+                mirror = AttachmentMirror(root, max_bytes=1 << 20)
+                try:
+                    # concurrent requests for one URL share a single download
+                    first, again = await asyncio.gather(
+                        mirror.fetch(cdn.url("/a/evidence.png"), "evidence.png"),
+                        mirror.fetch(cdn.url("/a/evidence.png"), "evidence.png"),
+                    )
+                    other = await mirror.fetch(cdn.url("/b/copy.png"), "copy.png")
+                    # a refreshed CDN signature is the same attachment
+                    cached = await mirror.fetch(cdn.url("/a/evidence.png", sig="b"), "evidence.png")
+                finally:
+                    await mirror.close()
+
+            expect(first == again == other == cached, f"identical bytes stored apart: {first}, {other}")
+            expect(len(blob_files(root)) == 1, f"expected one blob on disk, found {blob_files(root)}")
+            expect(mirror.total_bytes == len(body), "total_bytes counts the shared blob more than once")
+            expect(cdn.hits == {"/a/evidence.png": 1, "/b/copy.png": 1}, f"unexpected downloads {cdn.hits}")
+            with open(os.path.join(root, first), "rb") as f:
+                expect(hashlib.sha256(f.read()).hexdigest() == hashlib.sha256(body).hexdigest(),
+                       "mirrored bytes differ from the source")
+
+    asyncio.run(run())
+
+
+def check_mirror_eviction():
+    async def run():
+        rng = random.Random(2)
+        files = {f"/{n}.bin": rng.randbytes(1000) for n in "abcd"}
+        with tempfile.TemporaryDirectory() as root:
+            async with FakeCDN(files) as cdn:
+                mirror = AttachmentMirror(root, max_bytes=3000)
+                try:
+                    paths = {n: await mirror.fetch(cdn.url(f"/{n}.bin"), f"{n}.bin") for n in "abc"}
+                    await mirror.fetch(cdn.url("/a.bin"), "a.bin")    # a is now the most recent
+                    paths["d"] = await mirror.fetch(cdn.url("/d.bin"), "d.bin")
+                finally:
+                    await mirror.close()
+
+            on_disk = set(blob_files(root))
+            expect(paths["b"] not in on_disk, "least recently used blob survived going over the cap")
+            expect({paths[n] for n in "acd"} <= on_disk, "a recently used blob was evicted")
+            expect(mirror.total_bytes == 3000 and len(mirror.blobs) == 3, "cap accounting is off")
+            expect(all("b.bin" not in k for k in mirror.urls), "evicted blob still has a URL mapping")
+
+            # the saved index reloads to the same state
+            reloaded = AttachmentMirror(root, max_bytes=3000)
+            expect(list(reloaded.blobs) == list(mirror.blobs), "LRU order lost across restart")
+            expect(reloaded.urls == mirror.urls, "URL mapping lost across restart")
+
+    asyncio.run(run())
+
+
+def check_mirror_recovery():
+    async def run():
+        files = {"/kept.txt": b"k" * 1000, "/orphan.txt": b"o" * 1000, "/big.txt": b"b" * 1500}
+        with tempfile.TemporaryDirectory() as root:
+            async with FakeCDN(files) as cdn:
+                mirror = AttachmentMirror(root, max_bytes=3000)
+                try:
+                    await mirror.fetch(cdn.url("/kept.txt"), "kept.txt")
+                    with open(mirror._index_path()) as f:
+                        index_before = f.read()
+                    orphan = await mirror.fetch(cdn.url("/orphan.txt"), "orphan.txt")
+                finally:
+                    await mirror.close()
+
+            # crash after os.replace but before _save_index, mid-way through another download
+            with open(mirror._index_path(), "w") as f:
+                f.write(index_before)
+            partial = os.path.join(root, ".partial-0123")
+            with open(partial, "wb") as f:
+                f.write(b"half a download")
+
+            recovered = AttachmentMirror(root, max_bytes=3000)
+            orphan_digest = os.path.splitext(os.path.basename(orphan))[0]
+            expect(not os.path.exists(partial), "interrupted download left behind")
+            expect(orphan_digest in recovered.blobs, "unindexed blob was not adopted")
+            expect(next(iter(recovered.blobs)) == orphan_digest, "adopted blob should be evicted first")
+            expect(recovered.total_bytes == 2000, f"recovered total_bytes is {recovered.total_bytes}")
+            with open(recovered._index_path()) as f:
+                expect(orphan_digest in json.dumps(json.load(f)), "recovered index was not saved")
+
+            # the adopted blob goes first once the cap is hit
+            async with FakeCDN(files) as cdn:
+                try:
+                    await recovered.fetch(cdn.url("/big.txt"), "big.txt")
+                finally:
+                    await recovered.close()
+            expect(orphan_digest not in recovered.blobs, "adopted blob outlived a newer download")
+            expect(len(blob_files(root)) == len(recovered.blobs) == 2, "disk and index disagree after eviction")
+
+    asyncio.run(run())
+
+
+CHECKS = {
+    "quantiles": check_quantiles,
+    "buckets": check_buckets,
+    "retention": check_retention,
+    "export": check_export,
+    "snapshot": check_snapshot,
+    "mirror_dedupe": check_mirror_dedupe,
+    "mirror_eviction": check_mirror_eviction,
+    "mirror_recovery": check_mirror_recovery,
+}
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=list(CHECKS), help="run just these checks")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for name in args.only or CHECKS:
+        started = time.perf_counter()
+        try:
+            CHECKS[name]()
+        except CheckFailed as e:
+            failed += 1
+            print(f"{name:<16} FAIL  {e}")
+            continue
+        except Exception:
+            failed += 1
+            print(f"{name:<16} ERROR")
+            traceback.print_exc()
+            continue
+        print(f"{name:<16} ok    {time.perf_counter() - started:.2f}s")
+
+    total = len(args.only or CHECKS)
+    print(f"\n{total - failed}/{total} checks passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,658 @@
+"""Deterministic soak harness for the ticket lifecycle.
+
+Drives randomized interleavings of opens, messages, claims, warns, closes
+and manual channel deletes through the real handlers in ``main`` against an
+in-memory Discord stand-in, on an event loop whose clock only moves when
+every task is idle. Invariants are checked after every operation.
+
+    python soak.py --runs 20 --ops 5000
+    python soak.py --seed 7 --ops 200 --trace
+"""
+import argparse
+import asyncio
+import itertools
+import math
+import os
+import random
+import selectors
+import sys
+import tempfile
+import time
+import traceback
+import types
+from collections import Counter, deque
+
+START_TIME = 1_700_000_000.0
+
+
+# -------------------- VIRTUAL TIME --------------------
+
+class VirtualClock:
+    def __init__(self, now: float = START_TIME):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _VirtualSelector(selectors.SelectSelector):
+    def __init__(self, clock: VirtualClock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        # Nothing is ready: jump straight to the next timer instead of waiting.
+        if timeout is None:
+            raise RuntimeError("deadlock: every task is waiting and no timer is scheduled")
+        # Like a real clock, time always moves a little per loop iteration; otherwise a
+        # timer rounded to "now" would spin forever at epoch float precision.
+        self.clock.now = max(self.clock.now + timeout, math.nextafter(self.clock.now, math.inf))
+        return []
+
+
+class VirtualLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock: VirtualClock):
+        super().__init__(_VirtualSelector(clock))
+        self.clock = clock
+
+    def time(self):
+        return self.clock.now
+
+
+# -------------------- FAKE DISCORD --------------------
+
+def _not_found(what: str):
+    import discord
+    return discord.NotFound(types.SimpleNamespace(status=404, reason="Not Found"), f"Unknown {what}")
+
+
+def _forbidden(what: str):
+    import discord
+    return discord.Forbidden(types.SimpleNamespace(status=403, reason="Forbidden"), what)
+
+
+def _server_error(what: str):
+    import discord
+    return discord.HTTPException(types.SimpleNamespace(status=500, reason="Internal Server Error"), what)
+
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str):
+        self.id = role_id
+        self.name = name
+        self.mention = f"<@&{role_id}>"
+        self.members = []
+
+
+class FakeMember:
+    def __init__(self, backend, member_id: int, name: str, roles=()):
+        self.backend = backend
+        self.id = member_id
+        self.name = name
+        self.mention = f"<@{member_id}>"
+        self.roles = list(roles)
+        self.bot = False
+        self.avatar = None
+        self.status = "online"
+
+    def __str__(self):
+        return self.name
+
+    async def timeout(self, duration):
+        await self.backend.pause()
+        if self.backend.rng.random() < 0.1:
+            raise _forbidden("Missing Permissions")
+        self.backend.stats["timeouts"] += 1
+
+    async def send(self, *args, **kwargs):
+        await self.backend.pause()
+
+    async def add_roles(self, *roles):
+        await self.backend.pause()
+        self.roles.extend(roles)
+
+
+class FakeMessage:
+    _ids = itertools.count(10_000_000)
+
+    def __init__(self, channel, author, content="", embed=None, view=None):
+        import discord
+        self.id = next(self._ids)
+        self.channel = channel
+        self.author = author
+        self.content = content or ""
+        self.embeds = [embed] if embed else []
+        self.view = view
+        self.attachments = []
+        self.created_at = discord.utils.utcnow()
+
+    async def edit(self, *, embed=None, view=None, **kwargs):
+        await self.channel.backend.pause()
+        if embed is not None:
+            self.embeds = [embed]
+        self.view = view
+
+
+class FakeChannel:
+    def __init__(self, backend, guild, channel_id: int, name: str):
+        self.backend = backend
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self.mention = f"<#{channel_id}>"
+        self.messages = []
+        self.deleted = False
+        self.deleted_by_bot = False
+        self.bot_user = backend.bot
+        self.slow = 0    # seconds a transcript read takes, e.g. while attachments are mirrored
+
+    async def send(self, content=None, *, embed=None, view=None, file=None, **kwargs):
+        await self.backend.pause()
+        if self.deleted:
+            raise _not_found("Channel")
+        if self is self.backend.logs and self.backend.rng.random() < 0.05:
+            raise _server_error("Transcript upload failed")
+        msg = FakeMessage(self, self.bot_user, content, embed, view)
+        self.messages.append(msg)
+        return msg
+
+    async def history(self, limit=None, oldest_first=False):
+        if self.slow:
+            await asyncio.sleep(self.slow)
+        messages = self.messages if oldest_first else list(reversed(self.messages))
+        for msg in messages[:limit]:
+            await self.backend.pause()
+            if self.deleted:
+                raise _not_found("Channel")
+            yield msg
+
+    async def delete(self):
+        await self.backend.pause()
+        if self.deleted_by_bot:
+            self.backend.violation(f"double delete of channel {self.id}")
+        if self.deleted:
+            raise _not_found("Channel")
+        self.deleted_by_bot = True
+        self.remove()
+
+    def remove(self):
+        self.deleted = True
+        self.guild.channels.pop(self.id, None)
+        self.backend.stats["deletes"] += 1
+        self.backend.dispatch("on_guild_channel_delete", self)
+
+
+class FakeCategory:
+    def __init__(self, backend, guild, category_id: int):
+        self.backend = backend
+        self.guild = guild
+        self.id = category_id
+
+    async def create_text_channel(self, name, overwrites=None):
+        await self.backend.pause()
+        channel = FakeChannel(self.backend, self.guild, self.backend.next_id(), name)
+        self.guild.channels[channel.id] = channel
+        return channel
+
+
+class FakeGuild:
+    def __init__(self, backend):
+        self.id = 1
+        self.icon = None
+        self.channels = {}
+        self.roles = {}
+        self.members = {}
+        self.default_role = FakeRole(self.id, "@everyone")
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_role(self, role_id):
+        return self.roles.get(role_id)
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+
+class FakeResponse:
+    def __init__(self, backend):
+        self.backend = backend
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def send_message(self, *args, **kwargs):
+        await self.backend.pause()
+        self.done = True
+
+    async def send_modal(self, modal):
+        await self.backend.pause()
+        self.done = True
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+
+class FakeInteraction:
+    _ids = itertools.count(20_000_000)
+
+    def __init__(self, backend, user, channel, message=None):
+        self.id = next(self._ids)
+        self.user = user
+        self.guild = backend.guild
+        self.channel = channel
+        self.channel_id = channel.id
+        self.message = message
+        self.response = FakeResponse(backend)
+        self.followup = FakeResponse(backend)
+
+
+class FakeBackend:
+    """In-memory guild plus the bookkeeping the invariants need."""
+
+    def __init__(self, rng: random.Random, users: int, staff: int):
+        self.rng = rng
+        self._ids = itertools.count(100)
+        self.guild = FakeGuild(self)
+        self.bot = FakeMember(self, 99, "crystalhub-bot")
+        self.bot.bot = True
+        self.stats = Counter()
+        self.violations = []
+        self.errors = Counter()
+        self.error_samples = {}
+        self.tasks = set()
+
+        self.staff_role = FakeRole(self.next_id(), "Staff")
+        self.guild.roles[self.staff_role.id] = self.staff_role
+        self.category = FakeCategory(self, self.guild, self.next_id())
+        self.logs = FakeChannel(self, self.guild, self.next_id(), "ticket-logs")
+        self.guild.channels[self.logs.id] = self.logs
+
+        self.users = [self._member(f"player{i}") for i in range(users)]
+        self.staff = [self._member(f"staff{i}", [self.staff_role]) for i in range(staff)]
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def _member(self, name, roles=()):
+        member = FakeMember(self, self.next_id(), name, roles)
+        self.guild.members[member.id] = member
+        for role in roles:
+            role.members.append(member)
+        return member
+
+    def get_channel(self, channel_id):
+        return self.guild.get_channel(channel_id)
+
+    async def pause(self):
+        # Yield to the loop a random number of times so handlers interleave.
+        for _ in range(self.rng.randrange(3)):
+            await asyncio.sleep(0)
+
+    def spawn(self, coro, label: str):
+        task = asyncio.get_running_loop().create_task(self._guard(coro, label))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _guard(self, coro, label):
+        # discord.py logs handler exceptions and keeps going; count them instead.
+        try:
+            await coro
+        except Exception as e:
+            key = f"{label}: {type(e).__name__}"
+            self.errors[key] += 1
+            self.error_samples.setdefault(key, "".join(traceback.format_exception(e)[-3:]))
+
+    def dispatch(self, event: str, *args):
+        import main
+        handler = getattr(main, event, None)
+        if handler is not None:
+            self.spawn(handler(*args), event)
+
+    def violation(self, text: str):
+        self.violations.append(text)
+
+    def ticket_channels(self):
+        return [c for c in self.guild.channels.values() if isinstance(c, FakeChannel) and c is not self.logs]
+
+
+# -------------------- SCENARIO --------------------
+
+class Soak:
+    def __init__(self, seed: int, ops: int, concurrency: int, users: int, staff: int, trace: bool):
+        self.seed = seed
+        self.ops = ops
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+        self.backend = FakeBackend(self.rng, users, staff)
+        self.trace = trace
+        self.log = deque(maxlen=40)
+        self.levels = Counter()
+        self.disconnected = 0
+
+    def install(self, main, clock: VirtualClock, workdir: str):
+        import discord
+        from admission import AdmissionController
+        from analytics import Analytics
+        from supervisor import Supervisor
+        from warns import WarnManager
+
+        discord.utils.utcnow = lambda: __import__("datetime").datetime.fromtimestamp(
+            clock(), __import__("datetime").timezone.utc
+        )
+        main.client.get_channel = self.backend.get_channel
+        main.client.get_guild = lambda guild_id: self.backend.guild
+
+        for state in (main.ticket_config, main.ticket_owners, main.user_tickets, main.tier_filled,
+                      main.last_activity, main.user_ticket_cooldown, main.claimed_by, main.closing_tickets):
+            state.clear()
+        main.ticket_config.update({
+            "category": self.backend.category.id,
+            "staff_role": self.backend.staff_role.id,
+            "logs_channel": self.backend.logs.id,
+        })
+        self.backend.guild.channels[self.backend.category.id] = self.backend.category
+        main.analytics = Analytics(os.path.join(workdir, "events.jsonl"), clock=clock,
+                                   snapshot_path=os.path.join(workdir, "analytics.json"))
+        main.analytics.load()
+        main.warns = WarnManager(os.path.join(workdir, "warns.json"), clock=clock)
+        main.mirror = None
+        main.admission = AdmissionController(main.admission.defaults, clock=clock)
+
+        supervisor = Supervisor(clock=clock)
+        for worker in main.supervisor.workers.values():
+            supervisor.add(worker.name, worker.step, wait=worker.wait)
+        main.supervisor = supervisor
+
+    # ---- operations ----
+
+    def _ticket(self, main):
+        channels = [c for c in self.backend.ticket_channels() if c.id in main.ticket_owners]
+        return self.rng.choice(channels) if channels else None
+
+    async def press(self, view, ix, custom_id=None, label=None):
+        button = next(c for c in view.children if c.custom_id == custom_id or (label and c.label == label))
+        await view.interaction_check(ix)
+        await button.callback(ix)
+
+    async def op_open(self, main):
+        user = self.rng.choice(self.backend.users)
+        ix = FakeInteraction(self.backend, user, self.backend.logs)
+        view = main.MainPanel()
+        before = main.count_user_tickets(user.id)
+        limit = main.admission.limits["max_tickets"]
+        await self.press(view, ix, "crystalhub_tier_start")
+        limit = max(limit, main.admission.limits["max_tickets"])
+        after = main.count_user_tickets(user.id)
+        if after > max(before, limit):
+            self.backend.violation(f"user {user.id} opened ticket {after} with max_tickets {limit}")
+
+    async def op_message(self, main):
+        channel = self._ticket(main)
+        if channel is None:
+            return
+        if self.rng.random() < 0.7:
+            author = self.backend.guild.get_member(main.ticket_owners[channel.id])
+        else:
+            author = self.rng.choice(self.backend.staff)
+        msg = FakeMessage(channel, author, "gg")
+        channel.messages.append(msg)
+        await main.on_message(msg)
+
+    async def op_claim(self, main):
+        channel = self._ticket(main)
+        if channel is None:
+            return
+        view = main.TicketButtons()
+        panel = next((m for m in channel.messages if isinstance(m.view, main.TicketButtons)), None)
+        if panel is None:
+            return
+        ix = FakeInteraction(self.backend, self.rng.choice(self.backend.staff), channel, panel)
+        await self.press(view, ix, "claim_ticket")
+
+    async def op_warn(self, main):
+        channel = self._ticket(main)
+        if channel is None:
+            return
+        user = self.backend.guild.get_member(main.ticket_owners[channel.id])
+        ix = FakeInteraction(self.backend, self.rng.choice(self.backend.staff), channel)
+        await main.tree.interaction_check(ix)
+        await main.warn.callback(ix, user, self.rng.randint(1, 30), "Respond please", None)
+
+    async def op_close(self, main):
+        channel = self._ticket(main)
+        if channel is None:
+            return
+        staff = self.rng.choice(self.backend.staff)
+        buttons = main.TicketButtons()
+        ix = FakeInteraction(self.backend, staff, channel)
+        await self.press(buttons, ix, "close_ticket")
+
+        confirm = main.ConfirmCloseView()
+        ix = FakeInteraction(self.backend, staff, channel)
+        await self.press(confirm, ix, label="Confirm Close")
+
+    async def op_presence(self, main):
+        # testers come and go, which moves the admission level
+        member = self.rng.choice(self.backend.staff)
+        member.status = "offline" if member.status == "online" else "online"
+
+    async def op_delete(self, main):
+        # someone removes the channel by hand in Discord
+        channel = self._ticket(main)
+        if channel is not None and not channel.deleted:
+            channel.remove()
+
+    async def op_reconnect(self, main):
+        # the gateway drops and resumes, sometimes inside the supervisor's stop grace window
+        self.disconnected += 1
+        try:
+            self.backend.spawn(main.on_disconnect(), "on_disconnect")
+            await asyncio.sleep(self.rng.uniform(0, 2 * main.supervisor.grace))
+            await main.on_resumed()
+        finally:
+            self.disconnected -= 1
+
+    async def op_reconnect_closing(self, main):
+        # the gateway drops while auto-close is stuck in a slow transcript, so stop() cancels the sweep
+        channel = self._ticket(main)
+        if channel is None or channel.id in main.closing_tickets:
+            return
+        channel.slow = 3 * main.supervisor.grace
+        main.last_activity[channel.id] = 0
+        for _ in range(180):
+            if channel.id in main.closing_tickets:
+                break
+            await asyncio.sleep(1)
+        else:
+            return
+
+        self.disconnected += 1
+        try:
+            await main.on_disconnect()
+            await main.on_resumed()
+        finally:
+            self.disconnected -= 1
+
+    OPS = {
+        "open": 30, "message": 35, "claim": 10, "warn": 8, "close": 12, "delete": 2, "presence": 1,
+        "reconnect": 1, "reconnect_closing": 1,
+    }
+
+    # ---- invariants ----
+
+    def check(self, main):
+        owners = set(main.ticket_owners)
+        live = {c.id for c in self.backend.ticket_channels()}
+        for name, state in (("last_activity", main.last_activity), ("claimed_by", main.claimed_by),
+                            ("tier_filled", main.tier_filled), ("warnings", main.warns.by_channel)):
+            leaked = set(state) - owners
+            if leaked:
+                self.backend.violation(f"{name} leaked entries for closed tickets {sorted(leaked)[:5]}")
+                for key in leaked:
+                    state.pop(key, None)
+
+        # a close in flight settles its own ticket once it notices the channel is gone
+        stale = owners - live - main.closing_tickets
+        if stale:
+            self.backend.violation(f"ticket_owners references deleted channels {sorted(stale)[:5]}")
+            for cid in stale:
+                main.forget_ticket(cid)
+
+        orphaned = live - owners
+        if orphaned:
+            self.backend.violation(f"ticket channels alive but unregistered {sorted(orphaned)[:5]}")
+            for cid in orphaned:
+                self.backend.guild.get_channel(cid).remove()
+
+        indexed = {cid for channels in main.user_tickets.values() for cid in channels}
+        if indexed != set(main.ticket_owners):
+            self.backend.violation("user_tickets index out of sync with ticket_owners")
+
+        for user_id, channels in main.user_tickets.items():
+            if len(channels) > main.admission.upper_bound("max_tickets"):
+                self.backend.violation(f"user {user_id} holds {len(channels)} tickets, above any admission limit")
+
+        for worker in main.supervisor.workers.values():
+            if self.disconnected:
+                break
+            if worker.task is None or worker.task.done():
+                self.backend.violation(f"background worker {worker.name} is not running")
+                main.supervisor.start()
+
+    # ---- driver ----
+
+    async def run(self, main):
+        backend = self.backend
+        main.supervisor.start()
+        names, weights = zip(*self.OPS.items())
+
+        for i in range(self.ops):
+            op = self.rng.choices(names, weights)[0]
+            self.log.append(f"t+{asyncio.get_running_loop().time() - START_TIME:8.0f}s #{i} {op}")
+            if self.trace:
+                print(self.log[-1])
+            backend.stats[f"op_{op}"] += 1
+            backend.spawn(getattr(self, f"op_{op}")(main), op)
+
+            if len(backend.tasks) >= self.concurrency or self.rng.random() < 0.4:
+                await asyncio.sleep(self.rng.expovariate(1 / 30))
+            self.levels[main.admission.level_name] += 1
+            self.check(main)
+
+        # let everything settle, then give auto-close time to sweep idle tickets
+        while backend.tasks:
+            await asyncio.sleep(1)
+        await asyncio.sleep(3 * 3600)
+        while backend.tasks:
+            await asyncio.sleep(1)
+        self.check(main)
+
+        if main.ticket_owners:
+            backend.violation(f"{len(main.ticket_owners)} tickets never auto-closed")
+        if main.closing_tickets:
+            backend.violation(f"{len(main.closing_tickets)} tickets stuck in closing state")
+        if main.warns.warnings:
+            backend.violation(f"{len(main.warns.warnings)} warnings left pending for closed tickets")
+        if main.analytics.open_tickets():
+            backend.violation(f"{len(main.analytics.open_tickets())} tickets never recorded a close in analytics")
+
+        await main.supervisor.stop()
+        self.check_snapshot(main)
+
+    def check_snapshot(self, main):
+        # aggregates restored from the last periodic snapshot plus the log tail must match a full replay
+        from analytics import Analytics
+        live = main.analytics
+        restored = Analytics(live.path, clock=live.clock, snapshot_path=live.snapshot_path)
+        replayed = Analytics(live.path, clock=live.clock, snapshot_path=live.snapshot_path + ".missing")
+        restored.load()
+        replayed.load()
+        for name, other in (("snapshot", restored), ("full replay", replayed)):
+            if other.overview() != live.overview() or other.totals != live.totals:
+                self.backend.violation(f"analytics rebuilt from {name} differs from live aggregates")
+
+
+def run_one(seed: int, args) -> Soak:
+    import main
+
+    clock = VirtualClock()
+    loop = VirtualLoop(clock)
+    asyncio.set_event_loop(loop)
+    soak = Soak(seed, args.ops, args.concurrency, args.users, args.staff, args.trace)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            soak.install(main, clock, workdir)
+            loop.run_until_complete(soak.run(main))
+        finally:
+            os.chdir(cwd)
+            loop.close()
+            asyncio.set_event_loop(None)
+
+    soak.virtual_seconds = clock() - START_TIME
+    soak.workers = list(main.supervisor.workers.values())
+    return soak
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--runs", type=int, default=5, help="number of seeds to run")
+    parser.add_argument("--ops", type=int, default=2000, help="operations per run")
+    parser.add_argument("--concurrency", type=int, default=16, help="max in-flight operations")
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--staff", type=int, default=5)
+    parser.add_argument("--trace", action="store_true", help="print every operation")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("GUILD_ID", "1")
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+    os.environ.pop("MIRROR_DIR", None)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    failed = 0
+    total_ops = 0
+    started = time.perf_counter()
+
+    for seed in range(args.seed, args.seed + args.runs):
+        t0 = time.perf_counter()
+        soak = run_one(seed, args)
+        elapsed = time.perf_counter() - t0
+        total_ops += args.ops
+        b = soak.backend
+
+        status = "FAIL" if b.violations else "ok"
+        print(
+            f"seed={seed:<4} {status:4}  {args.ops} ops in {elapsed:6.2f}s "
+            f"({args.ops / elapsed:8.0f} ops/s, {soak.virtual_seconds / 3600:6.1f}h virtual)  "
+            f"opened={b.stats['op_open']} deletes={b.stats['deletes']} timeouts={b.stats['timeouts']} "
+            f"levels={dict(soak.levels)}"
+        )
+        worker_errors = {w.name: w.errors for w in soak.workers if w.errors}
+        if worker_errors:
+            print("    worker errors (restarted): " + ", ".join(f"{k} ×{v}" for k, v in worker_errors.items()))
+        if b.errors:
+            print("    handler errors: " + ", ".join(f"{k} ×{v}" for k, v in b.errors.most_common()))
+            if args.trace:
+                for key, sample in b.error_samples.items():
+                    print(f"    --- {key}\n{sample}")
+        if b.violations:
+            failed += 1
+            for text, count in Counter(b.violations).most_common(10):
+                print(f"    violation ×{count}: {text}")
+            print("    last operations:")
+            for line in soak.log:
+                print(f"      {line}")
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{args.runs - failed}/{args.runs} runs clean • {total_ops / elapsed:.0f} ops/s overall")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
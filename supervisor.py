@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+
+from logging_config import set_context
+
+logger = logging.getLogger("crystalhub.supervisor")
+
+
+class Worker:
+    """A background job: ``wait()`` until it is due, then run one ``step()``."""
+
+    def __init__(self, name: str, step, wait):
+        self.name = name
+        self.step = step
+        self.wait = wait
+        self.task = None
+        self.generation = 0
+
+        self.state = "stopped"
+        self.runs = 0
+        self.errors = 0
+        self.restarts = 0
+        self.consecutive_errors = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+        self.last_error_at = None
+
+    def health(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "runs": self.runs,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+        }
+
+
+class Supervisor:
+    """Owns every background worker, restarts failed ones with backoff and keeps metrics."""
+
+    def __init__(self, clock=time.time, base_backoff: float = 5, max_backoff: float = 300, grace: float = 10):
+        self.clock = clock
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.grace = grace
+        self.workers = {}
+        # bumped by stop(); tasks from an older generation finish their step and exit
+        self._generation = 0
+
+    def add(self, name: str, step, *, interval: float | None = None, wait=None):
+        if wait is None:
+            wait = lambda: asyncio.sleep(interval)
+        self.workers[name] = Worker(name, step, wait)
+
+    def start(self):
+        """Start workers that are not running; safe to call on every (re)connect.
+
+        A worker still draining from an earlier ``stop()`` gets a fresh task that
+        waits for the old one first, so a resume during the grace window keeps it alive.
+        """
+        for worker in self.workers.values():
+            current = worker.task is not None and not worker.task.done()
+            if current and worker.generation == self._generation:
+                continue
+            previous = worker.task if current else None
+            worker.generation = self._generation
+            worker.task = asyncio.create_task(
+                self._run(worker, self._generation, previous), name=f"worker:{worker.name}"
+            )
+
+    async def stop(self):
+        """Let in-flight steps finish (up to ``grace`` seconds), then cancel everything."""
+        self._generation += 1
+        stopped = {}
+        for worker in self.workers.values():
+            if worker.task is None or worker.task.done():
+                continue
+            if worker.state != "running":
+                worker.task.cancel()
+            stopped[worker.name] = worker.task
+
+        if not stopped:
+            return
+        tasks = list(stopped.values())
+        _, pending = await asyncio.wait(tasks, timeout=self.grace)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for worker in self.workers.values():
+            # start() may have replaced the task while we were waiting
+            if worker.task is stopped.get(worker.name):
+                worker.state = "stopped"
+                worker.task = None
+        logger.info("Background workers stopped")
+
+    def health(self) -> list[dict]:
+        return [worker.health() for worker in self.workers.values()]
+
+    async def _run(self, worker: Worker, generation: int, previous: asyncio.Task | None = None):
+        set_context(correlation=f"worker-{worker.name}")
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        while generation == self._generation:
+            worker.state = "idle"
+            started = None
+            error = None
+            try:
+                await worker.wait()
+                if generation != self._generation:
+                    break
+                worker.state = "running"
+                started = time.perf_counter()
+                await worker.step()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+
+            if started is not None:
+                worker.runs += 1
+                worker.last_run = self.clock()
+                worker.last_duration = time.perf_counter() - started
+            if error is None:
+                worker.consecutive_errors = 0
+                continue
+            if generation != self._generation:
+                break
+
+            worker.errors += 1
+            worker.consecutive_errors += 1
+            worker.last_error = f"{type(error).__name__}: {error}"
+            worker.last_error_at = self.clock()
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (worker.consecutive_errors - 1))
+            logger.error("Worker %s failed, restarting in %.0fs", worker.name, delay, exc_info=error)
+
+            worker.state = "backoff"
+            await asyncio.sleep(delay)
+            worker.restarts += 1
+        if worker.task is asyncio.current_task():
+            worker.state = "stopped"
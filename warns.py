@@ -0,0 +1,228 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+from collections import defaultdict
+
+WARNS_FILE = "warns.json"
+ACTIONS = ("reminder", "timeout", "close")
+DEFAULT_LADDER = [
+    {"action": "reminder", "after": 0},
+    {"action": "timeout", "after": 5},
+    {"action": "close", "after": 0},
+]
+
+
+def parse_ladder(text: str) -> list[dict]:
+    """Parse ``"reminder:0,timeout:5,close:0"`` into escalation steps."""
+    steps = []
+    for part in text.split(","):
+        action, _, after = part.strip().partition(":")
+        action = action.strip().lower()
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action `{action}`. Use {', '.join(ACTIONS)}.")
+        try:
+            minutes = int(after or 0)
+        except ValueError:
+            raise ValueError(f"`{after}` is not a number of minutes.")
+        if minutes < 0:
+            raise ValueError("Delays cannot be negative.")
+        steps.append({"action": action, "after": minutes})
+    if not steps:
+        raise ValueError("The ladder needs at least one step.")
+    return steps
+
+
+def format_ladder(ladder: list[dict]) -> str:
+    return " → ".join(f"{step['action']} (+{step['after']}m)" for step in ladder)
+
+
+def format_schedule(minutes: int, ladder: list[dict]) -> str:
+    """When each step fires for a warning issued now, e.g. ``reminder at 5m → ticket closes at 10m``."""
+    labels = {"reminder": "reminder", "timeout": "timeout", "close": "ticket closes"}
+    parts = []
+    for step in ladder:
+        minutes += step["after"]
+        parts.append(f"{labels[step['action']]} at {minutes}m")
+    return " → ".join(parts)
+
+
+class WarnManager:
+    """Pending warnings indexed by channel and user, fired in deadline order."""
+
+    def __init__(self, path: str = WARNS_FILE, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.loaded = False
+        self.warnings = {}
+        self.by_channel = defaultdict(set)
+        self.by_member = defaultdict(set)    # (channel_id, user_id) -> warning ids
+        self._heap = []
+        self._ids = itertools.count(1)
+        self._wakeup = asyncio.Event()
+
+    # -------------------- PERSISTENCE --------------------
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for warning in json.load(f):
+                self._index(warning)
+        self._ids = itertools.count(max(self.warnings, default=0) + 1)
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(list(self.warnings.values()), f)
+        os.replace(tmp, self.path)
+
+    # -------------------- INDEX --------------------
+
+    def _index(self, warning: dict):
+        wid = warning["id"]
+        self.warnings[wid] = warning
+        self.by_channel[warning["channel"]].add(wid)
+        self.by_member[(warning["channel"], warning["user"])].add(wid)
+        heapq.heappush(self._heap, (warning["deadline"], wid))
+
+    def _unindex(self, wid: int) -> dict | None:
+        warning = self.warnings.pop(wid, None)
+        if warning is None:
+            return None
+        key = (warning["channel"], warning["user"])
+        self.by_channel[warning["channel"]].discard(wid)
+        if not self.by_channel[warning["channel"]]:
+            del self.by_channel[warning["channel"]]
+        self.by_member[key].discard(wid)
+        if not self.by_member[key]:
+            del self.by_member[key]
+        return warning
+
+    def _compact(self):
+        # drop heap entries for warnings that were cleared or rescheduled
+        if len(self._heap) > 2 * len(self.warnings) + 16:
+            self._heap = [(d, w) for d, w in self._heap if self.warnings.get(w, {}).get("deadline") == d]
+            heapq.heapify(self._heap)
+
+    # -------------------- API --------------------
+
+    def add(self, channel_id: int, user_id: int, reason: str, minutes: int, ladder: list[dict]) -> dict:
+        now = self.clock()
+        warning = {
+            "id": next(self._ids),
+            "channel": channel_id,
+            "user": user_id,
+            "reason": reason,
+            "issued": now,
+            "ladder": ladder,
+            "stage": 0,
+            "deadline": now + minutes * 60 + ladder[0]["after"] * 60,
+        }
+        self._index(warning)
+        self.save()
+        self._wakeup.set()
+        return warning
+
+    def pending(self, channel_id: int, user_id: int | None = None) -> list[dict]:
+        ids = self.by_channel.get(channel_id, ()) if user_id is None else self.by_member.get((channel_id, user_id), ())
+        return [self.warnings[wid] for wid in ids]
+
+    def resolve(self, channel_id: int, user_id: int) -> list[dict]:
+        """Clear every warning for ``user_id`` in ``channel_id`` (they replied)."""
+        ids = self.by_member.get((channel_id, user_id))
+        if not ids:
+            return []
+        cleared = [self._unindex(wid) for wid in list(ids)]
+        self._compact()
+        self.save()
+        return cleared
+
+    def discard(self, warning_id: int) -> dict | None:
+        """Drop one warning, e.g. when it could not be delivered."""
+        warning = self._unindex(warning_id)
+        if warning is not None:
+            self._compact()
+            self.save()
+        return warning
+
+    def clear_channel(self, channel_id: int) -> list[dict]:
+        ids = self.by_channel.get(channel_id)
+        if not ids:
+            return []
+        cleared = [self._unindex(wid) for wid in list(ids)]
+        self._compact()
+        self.save()
+        return cleared
+
+    def pop_due(self) -> list[tuple[dict, dict]]:
+        """Return ``(warning, step)`` for every step whose deadline has passed.
+
+        Warnings with steps left are rescheduled; finished ones are removed.
+        """
+        now = self.clock()
+        fired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, wid = heapq.heappop(self._heap)
+            warning = self.warnings.get(wid)
+            if warning is None or warning["deadline"] != deadline:
+                continue
+
+            step = warning["ladder"][warning["stage"]]
+            fired.append((warning, step))
+
+            warning["stage"] += 1
+            if warning["stage"] < len(warning["ladder"]):
+                warning["deadline"] = deadline + warning["ladder"][warning["stage"]]["after"] * 60
+                heapq.heappush(self._heap, (warning["deadline"], wid))
+            else:
+                self._unindex(wid)
+
+        if fired:
+            self.save()
+        return fired
+
+    def retry(self, warning: dict, step: dict, delay: float = 60):
+        """Put back a step returned by ``pop_due`` that could not be carried out yet.
+
+        Later steps of the same warning from that batch become stale; see ``is_current``.
+        """
+        warning["stage"] = self._step_index(warning, step)
+        warning["deadline"] = self.clock() + delay
+        if warning["id"] in self.warnings:
+            heapq.heappush(self._heap, (warning["deadline"], warning["id"]))
+        else:
+            self._index(warning)
+        self.save()
+        self._wakeup.set()
+
+    def is_current(self, warning: dict, step: dict) -> bool:
+        """False once ``retry`` rolled the warning back to this step or an earlier one."""
+        return warning["stage"] > self._step_index(warning, step)
+
+    @staticmethod
+    def _step_index(warning: dict, step: dict) -> int:
+        return next(i for i, s in enumerate(warning["ladder"]) if s is step)
+
+    def next_deadline(self) -> float | None:
+        while self._heap and self.warnings.get(self._heap[0][1], {}).get("deadline") != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    async def wait_due(self):
+        """Sleep until the earliest deadline, waking early when a warning is added."""
+        while True:
+            self._wakeup.clear()
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else deadline - self.clock()
+            if timeout is not None and timeout <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return